@@ -7,6 +7,12 @@ import logging
 trimesh / vtk / numpy_to_vtk は処理内で import します。
 """
 
+
+def nodeInScene(node):
+    """True if node is in the main scene (ID lookup; vtkMRMLScene.IsNodePresent scans every node)."""
+    return node is not None and slicer.mrmlScene.GetNodeByID(node.GetID()) is node
+
+
 #
 # JointSpaceVisualizer
 #
@@ -35,7 +41,20 @@ class JointSpaceVisualizerWidget(ScriptedLoadableModuleWidget, VTKObservationMix
         ScriptedLoadableModuleWidget.__init__(self, parent)
         VTKObservationMixin.__init__(self)
         self.logic = None
-        self._resultNode = None
+        # Result of the last Apply/load, tracked by node ID (see _getResultNode)
+        self._resultNodeID = None
+        # Background processing state (see onApplyButton)
+        self._task = None
+        self._taskState = None
+        self._taskSourceNode = None
+        self._taskTimer = None
+        self._cancelEvent = None
+        self._live = None
+        self._liveTimer = None
+        self._liveSettleTimer = None
+        self._sceneRefreshTimer = None
+        # Options of the run that produced the result (stored with compact results)
+        self._resultOptions = None
 
     def setup(self):
         ScriptedLoadableModuleWidget.setup(self)
@@ -58,7 +77,8 @@ class JointSpaceVisualizerWidget(ScriptedLoadableModuleWidget, VTKObservationMix
                 'resultVisibilityCheckBox','resultOpacitySlider',
                 'maxillaVisibilityCheckBox','maxillaOpacitySlider',
                 'mandibleVisibilityCheckBox','mandibleOpacitySlider',
-                'minDistanceValueLabel','saveResultButton'):
+                'minDistanceValueLabel','contactAreaValueLabel','symmetricValueLabel','penetrationValueLabel',
+                'saveResultButton','loadResultButton'):
                 if not hasattr(self.ui, name) or getattr(self.ui, name) is None:
                     setattr(self.ui, name, slicer.util.findChild(uiWidget, name))
         except Exception as e:
@@ -78,11 +98,20 @@ class JointSpaceVisualizerWidget(ScriptedLoadableModuleWidget, VTKObservationMix
                 self.ui.maxillaSelector.setMRMLScene(slicer.mrmlScene)
             if self.ui.mandibleSelector:
                 self.ui.mandibleSelector.setMRMLScene(slicer.mrmlScene)
+            if getattr(self.ui, 'roiSelector', None):
+                self.ui.roiSelector.setMRMLScene(slicer.mrmlScene)
         except Exception as e:
             logging.warning(f"Selector setup warning: {e}")
 
         # Wire up signals
         self.ui.applyButton.connect('clicked(bool)', self.onApplyButton)
+        if hasattr(self.ui, 'cancelButton') and self.ui.cancelButton:
+            self.ui.cancelButton.connect('clicked(bool)', self.onCancelButton)
+            self.ui.cancelButton.enabled = False
+        import qt
+        self._taskTimer = qt.QTimer()
+        self._taskTimer.setInterval(100)
+        self._taskTimer.connect('timeout()', self._pollTask)
         if hasattr(self.ui, 'maxillaSelector') and self.ui.maxillaSelector:
             self.ui.maxillaSelector.currentNodeChanged.connect(self.onSelect)
         if hasattr(self.ui, 'mandibleSelector') and self.ui.mandibleSelector:
@@ -99,18 +128,66 @@ class JointSpaceVisualizerWidget(ScriptedLoadableModuleWidget, VTKObservationMix
             # Set initial state of slider based on checkbox
             self.onEnableDecimation(self.ui.enableDecimationCheckBox.checked)
 
-        # Observe scene changes to refresh state
+        # Distance options
+        if hasattr(self.ui, 'boundedSearchCheckBox'):
+            self.ui.boundedSearchCheckBox.connect('toggled(bool)', self.onDistanceOptionsChanged)
+        if hasattr(self.ui, 'multiresCheckBox'):
+            self.ui.multiresCheckBox.connect('toggled(bool)', self.onDistanceOptionsChanged)
+        if hasattr(self.ui, 'cropCheckBox'):
+            self.ui.cropCheckBox.connect('toggled(bool)', self.onDistanceOptionsChanged)
+        if hasattr(self.ui, 'distanceFieldCheckBox'):
+            self.ui.distanceFieldCheckBox.connect('toggled(bool)', self.onDistanceOptionsChanged)
+        if getattr(self.ui, 'roiSelector', None):
+            self.ui.roiSelector.currentNodeChanged.connect(self.onDistanceOptionsChanged)
+        self.onDistanceOptionsChanged()
+
+        # Live preview: coalesce transform events to ~30 Hz, refine once the drag has stopped
+        self._liveTimer = qt.QTimer()
+        self._liveTimer.setSingleShot(True)
+        self._liveTimer.setInterval(33)
+        self._liveTimer.connect('timeout()', lambda: self._updateLivePreview(refine=False))
+        self._liveSettleTimer = qt.QTimer()
+        self._liveSettleTimer.setSingleShot(True)
+        self._liveSettleTimer.setInterval(300)
+        self._liveSettleTimer.connect('timeout()', lambda: self._updateLivePreview(refine=True))
+        if hasattr(self.ui, 'livePreviewCheckBox'):
+            self.ui.livePreviewCheckBox.connect('toggled(bool)', self.onLivePreviewToggled)
+            for selector in (self.ui.maxillaSelector, self.ui.mandibleSelector):
+                if selector:
+                    selector.currentNodeChanged.connect(
+                        lambda *_: self.onLivePreviewToggled(self.ui.livePreviewCheckBox.checked))
+
+        # Observe scene changes to refresh state, coalesced into one refresh per event-loop turn
+        # (loading hundreds of nodes must not refresh the panel once per node)
+        self._sceneRefreshTimer = qt.QTimer()
+        self._sceneRefreshTimer.setSingleShot(True)
+        self._sceneRefreshTimer.setInterval(0)
+        self._sceneRefreshTimer.connect('timeout()', self._refreshFromScene)
         self.addObserver(slicer.mrmlScene, slicer.vtkMRMLScene.NodeAddedEvent, self._onSceneChanged)
         self.addObserver(slicer.mrmlScene, slicer.vtkMRMLScene.NodeRemovedEvent, self._onSceneChanged)
+        self.addObserver(slicer.mrmlScene, slicer.vtkMRMLScene.EndBatchProcessEvent, self._onSceneChanged)
 
         self.onSelect()
         self._wireDisplayControls()
         self._syncDisplayControls()
 
     def cleanup(self):
+        self._stopLivePreview()
+        if self._task is not None:
+            if self._cancelEvent is not None:
+                self._cancelEvent.set()
+            self._task.join(timeout=5.0)
+        if self._taskTimer is not None:
+            self._taskTimer.stop()
+        if self._sceneRefreshTimer is not None:
+            self._sceneRefreshTimer.stop()
         self.removeObservers()
+        from JointSpaceVisualizerLib import distance
+        distance.shutdown_pools()
 
     def onSelect(self):
+        if self._task is not None:
+            return
         try:
             maxilla = self.ui.maxillaSelector.currentNode() if hasattr(self.ui, 'maxillaSelector') and self.ui.maxillaSelector else None
             mandible = self.ui.mandibleSelector.currentNode() if hasattr(self.ui, 'mandibleSelector') and self.ui.mandibleSelector else None
@@ -119,35 +196,186 @@ class JointSpaceVisualizerWidget(ScriptedLoadableModuleWidget, VTKObservationMix
             logging.warning(f"onSelect failed: {e}")
             self.ui.applyButton.enabled = False
 
+    def _processOptions(self):
+        """Reads the processing options from the UI as keyword arguments for the logic."""
+        enable_decimation = self.ui.enableDecimationCheckBox.checked if hasattr(self.ui, 'enableDecimationCheckBox') else False
+        decimation_value = float(self.ui.decimationSlider.value) if hasattr(self.ui, 'decimationSlider') else 0.0
+        multires = self.ui.multiresCheckBox.checked if hasattr(self.ui, 'multiresCheckBox') else False
+        bounded = self.ui.boundedSearchCheckBox.checked if hasattr(self.ui, 'boundedSearchCheckBox') else False
+        num_workers = int(self.ui.workersSpinBox.value) if hasattr(self.ui, 'workersSpinBox') else 1
+        crop = self.ui.cropCheckBox.checked if hasattr(self.ui, 'cropCheckBox') else False
+        roiNode = self.ui.roiSelector.currentNode() if getattr(self.ui, 'roiSelector', None) else None
+        field = self.ui.distanceFieldCheckBox.checked if hasattr(self.ui, 'distanceFieldCheckBox') else False
+        field_spacing = float(self.ui.fieldSpacingSpinBox.value) if hasattr(self.ui, 'fieldSpacingSpinBox') else 0.5
+        bidirectional = self.ui.bidirectionalCheckBox.checked if hasattr(self.ui, 'bidirectionalCheckBox') else False
+        signed = self.ui.signedCheckBox.checked if hasattr(self.ui, 'signedCheckBox') else False
+        useCutoff = bounded or multires or crop or field or roiNode is not None
+        max_distance = float(self.ui.maxDistanceSpinBox.value) if useCutoff and hasattr(self.ui, 'maxDistanceSpinBox') else None
+        if field:
+            distance_backend = 'field'
+        elif multires:
+            # Full-resolution output with exact values below the cutoff: the bounded locator
+            # search gives the same values as the coarse-to-fine backend, and faster
+            distance_backend = 'locator'
+            enable_decimation = False
+        elif bounded or num_workers > 1:
+            distance_backend = 'locator'
+        else:
+            distance_backend = 'filter'
+        return dict(
+            enable_decimation=enable_decimation,
+            decimation_value=decimation_value / 100.0,
+            distance_backend=distance_backend,
+            max_distance=max_distance,
+            num_workers=num_workers,
+            crop=crop,
+            roiNode=roiNode,
+            field_spacing=field_spacing,
+            bidirectional=bidirectional,
+            signed=signed,
+        )
+
     def onApplyButton(self):
-        self.ui.applyButton.enabled = False
-        slicer.app.processEvents()
+        # Runs the pipeline on a worker thread; only MRML access happens here and in _pollTask
+        import threading
+        from JointSpaceVisualizerLib.perf import StageRecorder
+        from JointSpaceVisualizerLib.progress import ProgressReporter
+
+        if self._task is not None:
+            return
+        sourceNode = self.ui.mandibleSelector.currentNode()
+        targetNode = self.ui.maxillaSelector.currentNode()
+        if not sourceNode or not targetNode:
+            return
+        self._stopLivePreview()
+        options = self._processOptions()
+        recorder = StageRecorder()
+        try:
+            kwargs = self.logic.pipelineArguments(sourceNode, targetNode, recorder=recorder, **options)
+        except Exception as e:
+            slicer.util.errorDisplay(f"An error occurred during processing: {e}")
+            logging.error(f"Processing failed: {e}")
+            return
+
+        state = {'stage': 'Starting', 'value': 0.0, 'result': None, 'error': None, 'cancelled': False,
+                 'recorder': recorder, 'target': targetNode, 'options': options,
+                 'matrix': kwargs['source_matrix']}
+        self._taskState = state
+        self._taskSourceNode = sourceNode
+        self._cancelEvent = threading.Event()
+
+        def onProgress(stage, value):
+            # Worker thread: only plain assignments, the timer reads them on the main thread
+            state['stage'] = stage
+            state['value'] = value
+
+        reporter = ProgressReporter(onProgress, self._cancelEvent)
+        self._task = threading.Thread(target=self._runTask, args=(kwargs, reporter, state), daemon=True)
+        self._setTaskRunning(True)
+        self._task.start()
+        self._taskTimer.start()
+
+    @staticmethod
+    def _runTask(kwargs, reporter, state):
+        from JointSpaceVisualizerLib import pipeline
+        from JointSpaceVisualizerLib.progress import Cancelled
+        try:
+            state['result'] = pipeline.compute_distance_map(progress=reporter, **kwargs)
+        except Cancelled:
+            state['cancelled'] = True
+        except Exception as e:
+            state['error'] = e
+
+    def _pollTask(self):
+        state = self._taskState
+        if state is None:
+            return
+        if hasattr(self.ui, 'progressBar') and self.ui.progressBar:
+            self.ui.progressBar.value = int(round(state['value'] * 100))
+            self.ui.progressBar.setFormat(f"{state['stage']} %p%")
+        if self._task is not None and self._task.is_alive():
+            return
+
+        self._taskTimer.stop()
+        self._task = None
+        self._taskState = None
         try:
-            enable_decimation = self.ui.enableDecimationCheckBox.checked if hasattr(self.ui, 'enableDecimationCheckBox') else False
-            decimation_value = float(self.ui.decimationSlider.value) if hasattr(self.ui, 'decimationSlider') else 0.0
-            out = self.logic.process(
-                self.ui.mandibleSelector.currentNode(),
-                self.ui.maxillaSelector.currentNode(),
-                enable_decimation,
-                decimation_value / 100.0,
-            )
-            # Unpack result and min distance
-            minDistance = None
-            if isinstance(out, tuple):
-                self._resultNode, minDistance = out
+            if state['cancelled']:
+                logging.info("Processing cancelled.")
+            elif state['error'] is not None:
+                slicer.util.errorDisplay(f"An error occurred during processing: {state['error']}")
+                logging.error(f"Processing failed: {state['error']}")
+            elif not nodeInScene(self._taskSourceNode):
+                logging.warning("Source model was removed during processing; result discarded.")
             else:
-                self._resultNode = out
-            if hasattr(self.ui, 'minDistanceValueLabel') and self.ui.minDistanceValueLabel:
-                try:
-                    self.ui.minDistanceValueLabel.text = (f"{float(minDistance):.2f}" if minDistance is not None else "-")
-                except Exception:
-                    self.ui.minDistanceValueLabel.text = "-"
-            self._syncDisplayControls()
+                summary = None
+                if state['options'].get('bidirectional'):
+                    if not nodeInScene(state['target']):
+                        raise RuntimeError("Target model was removed during processing")
+                    resultNode, targetResultNode, summary = self.logic.createBidirectionalResultNodes(
+                        self._taskSourceNode, state['target'], state['result'], state['recorder'])
+                    self.logic.setResultPose(targetResultNode, state['target'])
+                    minDistance = summary['min'] if summary else None
+                else:
+                    resultNode, minDistance = self.logic.createResultNode(self._taskSourceNode, state['result'],
+                                                                          state['recorder'])
+                self.logic.setResultPose(resultNode, self._taskSourceNode, state['matrix'])
+                self._resultNodeID = resultNode.GetID()
+                stats, _, _ = self.logic.contactStatistics(self._taskSourceNode, resultNode,
+                                                           recorder=state['recorder'])
+                self.logic.lastContactStatistics = stats
+                self._resultOptions = {k: v for k, v in state['options'].items() if k != 'roiNode'}
+                self.logic.lastPerformance = state['recorder'].records
+                self._showPerformance(state['recorder'])
+                if (hasattr(self.ui, 'performanceLogCheckBox') and self.ui.performanceLogCheckBox.checked
+                        and self.ui.performanceLogPathLineEdit.currentPath):
+                    self.logic.writePerformanceLog(self.ui.performanceLogPathLineEdit.currentPath, state['recorder'],
+                                                   self._taskSourceNode, state['target'], state['options'])
+                if hasattr(self.ui, 'minDistanceValueLabel') and self.ui.minDistanceValueLabel:
+                    try:
+                        self.ui.minDistanceValueLabel.text = (f"{float(minDistance):.2f}" if minDistance is not None else "-")
+                    except Exception:
+                        self.ui.minDistanceValueLabel.text = "-"
+                if hasattr(self.ui, 'contactAreaValueLabel') and self.ui.contactAreaValueLabel:
+                    self.ui.contactAreaValueLabel.text = (
+                        " / ".join(f"<{t:g}: {a:.1f}" for t, a in stats['contact_area'].items()) if stats else "-")
+                if hasattr(self.ui, 'penetrationValueLabel') and self.ui.penetrationValueLabel:
+                    penetration = stats['penetration'] if stats and state['options'].get('signed') else None
+                    self.ui.penetrationValueLabel.text = (
+                        f"{penetration['area']:.1f} mm² / {penetration['volume']:.1f} mm³ / "
+                        f"depth {penetration['depth']:.2f}" if penetration else "-")
+                if hasattr(self.ui, 'symmetricValueLabel') and self.ui.symmetricValueLabel:
+                    self.ui.symmetricValueLabel.text = (
+                        f"min {summary['min']:.2f} / mean {summary['mean']:.2f} / Hausdorff {summary['hausdorff']:.2f}"
+                        if summary else "-")
+                self._syncDisplayControls()
+                if hasattr(self.ui, 'livePreviewCheckBox') and self.ui.livePreviewCheckBox.checked:
+                    self._startLivePreview()
         except Exception as e:
             slicer.util.errorDisplay(f"An error occurred during processing: {e}")
             logging.error(f"Processing failed: {e}")
         finally:
-            self.ui.applyButton.enabled = True
+            self._taskSourceNode = None
+            self._setTaskRunning(False)
+            if hasattr(self.ui, 'progressBar') and self.ui.progressBar:
+                self.ui.progressBar.setFormat("Cancelled" if state['cancelled'] else "%p%")
+
+    def onCancelButton(self, *_):
+        if self._cancelEvent is not None:
+            self._cancelEvent.set()
+        if hasattr(self.ui, 'cancelButton') and self.ui.cancelButton:
+            self.ui.cancelButton.enabled = False
+
+    def _setTaskRunning(self, running):
+        if hasattr(self.ui, 'cancelButton') and self.ui.cancelButton:
+            self.ui.cancelButton.enabled = running
+        if hasattr(self.ui, 'progressBar') and self.ui.progressBar and running:
+            self.ui.progressBar.value = 0
+        if running:
+            self.ui.applyButton.enabled = False
+        else:
+            self._cancelEvent = None
+            self.onSelect()
 
     def onEnableDecimation(self, checked):
         try:
@@ -156,6 +384,115 @@ class JointSpaceVisualizerWidget(ScriptedLoadableModuleWidget, VTKObservationMix
         except Exception as e:
             logging.warning(f"onEnableDecimation failed: {e}")
 
+    def onDistanceOptionsChanged(self, *_):
+        try:
+            if hasattr(self.ui, 'maxDistanceSpinBox') and self.ui.maxDistanceSpinBox:
+                multires = self.ui.multiresCheckBox.checked if hasattr(self.ui, 'multiresCheckBox') else False
+                bounded = self.ui.boundedSearchCheckBox.checked if hasattr(self.ui, 'boundedSearchCheckBox') else False
+                crop = self.ui.cropCheckBox.checked if hasattr(self.ui, 'cropCheckBox') else False
+                field = self.ui.distanceFieldCheckBox.checked if hasattr(self.ui, 'distanceFieldCheckBox') else False
+                roiNode = self.ui.roiSelector.currentNode() if getattr(self.ui, 'roiSelector', None) else None
+                self.ui.maxDistanceSpinBox.enabled = bool(bounded or multires or crop or field or roiNode)
+            if hasattr(self.ui, 'fieldSpacingSpinBox') and self.ui.fieldSpacingSpinBox:
+                self.ui.fieldSpacingSpinBox.enabled = bool(self.ui.distanceFieldCheckBox.checked)
+        except Exception as e:
+            logging.warning(f"onDistanceOptionsChanged failed: {e}")
+
+    def _showPerformance(self, recorder):
+        """Fills the Performance table with the stage records of the last run."""
+        if not hasattr(self.ui, 'performanceTable') or not self.ui.performanceTable:
+            return
+        import qt
+        columns = ("Stage", "Wall (s)", "CPU (s)", "ΔRSS (MB)", "Points in", "Points out")
+        table = self.ui.performanceTable
+        records = list(recorder.records)
+        table.clear()
+        table.setColumnCount(len(columns))
+        table.setHorizontalHeaderLabels(columns)
+        table.setRowCount(len(records) + 1)
+        for row, record in enumerate(records):
+            points_in = next((record[k] for k in ('input_points', 'source_points', 'result_points') if k in record), "")
+            points_out = next((record[k] for k in ('output_points', 'output_source_points') if k in record), "")
+            name = record['stage'] + (" (cached)" if record.get('cached') else "") + (" (failed)" if record.get('failed') else "")
+            if 'field_error' in record:
+                error = record['field_error']
+                name += f" (field error max {error['max']:.3f} / mean {error['mean']:.3f} / p95 {error['p95']:.3f} mm)"
+            for column, value in enumerate((name, f"{record['wall_s']:.3f}", f"{record['cpu_s']:.3f}",
+                                            f"{record['rss_delta_mb']:.1f}", str(points_in), str(points_out))):
+                table.setItem(row, column, qt.QTableWidgetItem(value))
+        table.setItem(len(records), 0, qt.QTableWidgetItem("Sum"))
+        table.setItem(len(records), 1, qt.QTableWidgetItem(f"{recorder.total_wall_s():.3f}"))
+        table.resizeColumnsToContents()
+
+    # --- Live preview ---
+    def onLivePreviewToggled(self, checked):
+        self._stopLivePreview()
+        if checked and self._task is None:
+            self._startLivePreview()
+
+    def _startLivePreview(self):
+        sourceNode = self._getMandibleNode()
+        targetNode = self._getMaxillaNode()
+        resultNode = self._getResultNode()
+        if not sourceNode or not targetNode or not resultNode:
+            logging.info("Live preview starts after the first Apply.")
+            return
+        if self._resultOptions and self._resultOptions.get('signed'):
+            # The preview computes unsigned distances and would leave the penetration stats stale
+            logging.info("Live preview is not available for signed results.")
+            return
+        try:
+            cutoff = float(self.ui.maxDistanceSpinBox.value) if hasattr(self.ui, 'maxDistanceSpinBox') else None
+            num_workers = int(self.ui.workersSpinBox.value) if hasattr(self.ui, 'workersSpinBox') else 1
+            tracker = self.logic.livePreviewTracker(resultNode, targetNode, cutoff, num_workers)
+        except Exception as e:
+            logging.warning(f"Live preview unavailable: {e}")
+            return
+        self._live = {
+            'tracker': tracker,
+            'source': sourceNode,
+            'target': targetNode,
+            'result': resultNode,
+        }
+        self.addObserver(sourceNode, slicer.vtkMRMLTransformableNode.TransformModifiedEvent,
+                         self._onSourceTransformModified)
+        # An Apply result at the current pose is kept; the preview takes over once the pose changes
+        if self.logic.resultPoseChanged(resultNode, sourceNode, targetNode):
+            self._updateLivePreview(refine=True)
+
+    def _stopLivePreview(self):
+        if self._liveTimer is not None:
+            self._liveTimer.stop()
+            self._liveSettleTimer.stop()
+        if self._live is not None:
+            self.removeObserver(self._live['source'], slicer.vtkMRMLTransformableNode.TransformModifiedEvent,
+                                self._onSourceTransformModified)
+            self._live = None
+
+    def _onSourceTransformModified(self, caller, event):
+        if self._live is None:
+            return
+        if not self._liveTimer.isActive():
+            self._liveTimer.start()
+        self._liveSettleTimer.start()
+
+    def _updateLivePreview(self, refine=False):
+        live = self._live
+        if live is None:
+            return
+        if not all(nodeInScene(live[k]) for k in ('source', 'target', 'result')):
+            self._stopLivePreview()
+            return
+        try:
+            minDistance = self.logic.updateLivePreview(live['tracker'], live['source'], live['target'], live['result'],
+                                                       refine)
+        except Exception as e:
+            logging.warning(f"Live preview failed: {e}")
+            self._stopLivePreview()
+            return
+        if hasattr(self.ui, 'minDistanceValueLabel') and self.ui.minDistanceValueLabel:
+            self.ui.minDistanceValueLabel.text = f"{minDistance:.2f}" if minDistance is not None else "-"
+
     def onLoadModel(self, combo: 'qMRMLNodeComboBox'):
         import qt
         import os
@@ -164,7 +501,7 @@ class JointSpaceVisualizerWidget(ScriptedLoadableModuleWidget, VTKObservationMix
         if not filePath:
             return
         try:
-            node = slicer.util.loadNodeFromFile(filePath, 'ModelFile', {})
+            node = self.logic.loadModel(filePath)
             if node:
                 combo.setCurrentNodeID(node.GetID())
                 self.onSelect()
@@ -172,6 +509,13 @@ class JointSpaceVisualizerWidget(ScriptedLoadableModuleWidget, VTKObservationMix
             slicer.util.errorDisplay(f"Failed to load model: {e}")
 
     def _onSceneChanged(self, caller, event, callData=None):
+        # Scene loads/imports end with EndBatchProcessEvent; skip the per-node events before it
+        if slicer.mrmlScene.IsBatchProcessing():
+            return
+        if not self._sceneRefreshTimer.isActive():
+            self._sceneRefreshTimer.start()
+
+    def _refreshFromScene(self):
         self.onSelect()
         self._syncDisplayControls()
 
@@ -193,6 +537,8 @@ class JointSpaceVisualizerWidget(ScriptedLoadableModuleWidget, VTKObservationMix
                 self.ui.mandibleOpacitySlider.connect('valueChanged(double)', self.onMandibleOpacityChanged)
             if hasattr(self.ui, 'saveResultButton') and self.ui.saveResultButton:
                 self.ui.saveResultButton.connect('clicked(bool)', self.onSaveResult)
+            if hasattr(self.ui, 'loadResultButton') and self.ui.loadResultButton:
+                self.ui.loadResultButton.connect('clicked(bool)', self.onLoadResult)
         except Exception as e:
             logging.warning(f"Display control wiring failed: {e}")
 
@@ -237,17 +583,11 @@ class JointSpaceVisualizerWidget(ScriptedLoadableModuleWidget, VTKObservationMix
             return None
 
     def _getResultNode(self):
-        if self._resultNode and slicer.mrmlScene.IsNodePresent(self._resultNode):
-            return self._resultNode
-        # Try to find by naming convention
-        mandible = self._getMandibleNode()
-        if mandible:
-            result_name = f"{mandible.GetName()}_DistanceMap"
-            try:
-                return slicer.util.getNode(result_name)
-            except Exception:
-                return None
-        return None
+        # ID lookup, then the result the logic referenced from the source model (no name scans)
+        node = slicer.mrmlScene.GetNodeByID(self._resultNodeID) if self._resultNodeID else None
+        if node is not None:
+            return node
+        return self.logic.resultNode(self._getMandibleNode()) if self.logic else None
 
     def _setNodeVisibility(self, node, visible):
         if not node:
@@ -287,6 +627,8 @@ class JointSpaceVisualizerWidget(ScriptedLoadableModuleWidget, VTKObservationMix
         # Save button state
         if hasattr(self.ui, 'saveResultButton') and self.ui.saveResultButton:
             self.ui.saveResultButton.enabled = self._getResultNode() is not None
+        if hasattr(self.ui, 'loadResultButton') and self.ui.loadResultButton:
+            self.ui.loadResultButton.enabled = self._getMandibleNode() is not None
 
     def onSaveResult(self, *_):
         import qt, os
@@ -296,11 +638,15 @@ class JointSpaceVisualizerWidget(ScriptedLoadableModuleWidget, VTKObservationMix
             return
         # Suggest a safe default (VTP preserves scalars). STL may drop scalars.
         defaultName = f"{node.GetName()}.vtp"
-        filters = "VTP (*.vtp);;VTK (*.vtk);;PLY (*.ply);;STL (*.stl)"
+        filters = "VTP (*.vtp);;VTK (*.vtk);;PLY (*.ply);;STL (*.stl);;Distances only (*.npz)"
         outPath = qt.QFileDialog.getSaveFileName(slicer.util.mainWindow(), 'Save Result Model', os.path.join(os.path.expanduser('~'), defaultName), filters)
         if not outPath:
             return
         try:
+            if outPath.lower().endswith('.npz'):
+                # Compact: Distance values + source geometry hash + options, reattached with Load Distances
+                self.logic.saveDistances(node, self._getMandibleNode(), outPath, self._resultOptions)
+                return
             ok = slicer.util.saveNode(node, outPath)
             if not ok:
                 raise RuntimeError('saveNode returned False')
@@ -310,179 +656,625 @@ class JointSpaceVisualizerWidget(ScriptedLoadableModuleWidget, VTKObservationMix
         except Exception as e:
             slicer.util.errorDisplay(f"Failed to save: {e}")
 
+    def onLoadResult(self, *_):
+        import qt, os
+        from JointSpaceVisualizerLib import pipeline
+        sourceNode = self._getMandibleNode()
+        if not sourceNode:
+            slicer.util.infoDisplay('Select the Source (Mandible) model the distances were computed on first.')
+            return
+        inPath = qt.QFileDialog.getOpenFileName(slicer.util.mainWindow(), 'Load Distances', os.path.expanduser('~'),
+                                                "Distances (*.npz)")
+        if not inPath:
+            return
+        try:
+            self._stopLivePreview()
+            resultNode, meta = self.logic.loadDistances(sourceNode, inPath)
+            self._resultNodeID = resultNode.GetID()
+            self._resultOptions = meta.get('params') or None
+            minDistance = pipeline.min_distance(resultNode.GetPolyData())
+            if hasattr(self.ui, 'minDistanceValueLabel') and self.ui.minDistanceValueLabel:
+                self.ui.minDistanceValueLabel.text = f"{minDistance:.2f}" if minDistance is not None else "-"
+            self._syncDisplayControls()
+        except Exception as e:
+            slicer.util.errorDisplay(f"Failed to load: {e}")
+
 #
 # JointSpaceVisualizerLogic
 #
 
 class JointSpaceVisualizerLogic(ScriptedLoadableModuleLogic):
 
+    def __init__(self, cache_dir=None):
+        ScriptedLoadableModuleLogic.__init__(self)
+        # Decimated meshes / target locators reused across Apply (created on first use)
+        self.cache = None
+        self.cache_dir = cache_dir
+        # Per-stage records of the last process() run (see JointSpaceVisualizerLib.perf)
+        self.lastPerformance = []
+        # Contact statistics of the last process() run (see contactStatistics)
+        self.lastContactStatistics = None
+        # Distance colour node, built once and tracked by ID (see distanceColorNode)
+        self._colorNodeID = None
+
+    # Node reference roles from an input model to the outputs computed for it
+    RESULT_REFERENCE_ROLE = 'JointSpaceVisualizerDistanceMap'
+    CONTACT_TABLE_REFERENCE_ROLE = 'JointSpaceVisualizerContactStatistics'
+    HISTOGRAM_TABLE_REFERENCE_ROLE = 'JointSpaceVisualizerDistanceHistogram'
+    MOTION_TABLE_REFERENCE_ROLE = 'JointSpaceVisualizerMotionMetrics'
+    MOTION_CHART_REFERENCE_ROLE = 'JointSpaceVisualizerMotionChart'
+    # Source -> target matrix (16 values, row-major) a result's distances were computed for
+    RESULT_POSE_ATTRIBUTE = 'JointSpaceVisualizer.SourceToTarget'
+
+    def replaceOutputNode(self, ownerNode, role, className, name):
+        """
+        Adds a new className node called name, referenced from ownerNode under role, and removes
+        the node previously referenced there (no name lookups in the scene). Main thread only.
+        """
+        oldNode = ownerNode.GetNodeReference(role)
+        if nodeInScene(oldNode):
+            slicer.mrmlScene.RemoveNode(oldNode)
+        node = slicer.mrmlScene.AddNewNodeByClass(className, name)
+        ownerNode.SetNodeReferenceID(role, node.GetID())
+        return node
+
+    def resultNode(self, sourceNode):
+        """The <source>_DistanceMap last created for sourceNode, or None."""
+        return sourceNode.GetNodeReference(self.RESULT_REFERENCE_ROLE) if sourceNode else None
+
+    def distanceColorNode(self):
+        """
+        Red/yellow/green/blue colour node for 0..5 mm (magenta below 0 for penetration).
+        Built on first use and reused by ID afterwards; rebuilt only if it left the scene.
+        """
+        colorNode = slicer.mrmlScene.GetNodeByID(self._colorNodeID) if self._colorNodeID else None
+        if colorNode is not None:
+            return colorNode
+        colorNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLProceduralColorNode", "JSV_RYGB_0to5")
+        ctf = colorNode.GetColorTransferFunction()
+        ctf.RemoveAllPoints()
+        # Penetration (negative signed distance): magenta, darker with depth
+        ctf.AddRGBPoint(-5.0, 0.4, 0.0, 0.4)
+        ctf.AddRGBPoint(-0.01, 1.0, 0.0, 1.0)
+        # Keep red flat from 0 to 1.0 mm
+        ctf.AddRGBPoint(0.0, 1.0, 0.0, 0.0)    # red
+        ctf.AddRGBPoint(1.0, 1.0, 0.0, 0.0)    # red (flat until 1.0)
+        # Transition through yellow and green between 1.0 and 4.0 mm
+        ctf.AddRGBPoint(1.6, 1.0, 1.0, 0.0)    # yellow at 1.6 mm
+        ctf.AddRGBPoint(3.25, 0.0, 1.0, 0.0)   # green
+        # Clamp to blue from 4.0 mm upwards
+        ctf.AddRGBPoint(4.0, 0.0, 0.0, 1.0)    # blue
+        ctf.AddRGBPoint(5.0, 0.0, 0.0, 1.0)    # blue
+        self._colorNodeID = colorNode.GetID()
+        return colorNode
+
+    def getCache(self):
+        if self.cache is None:
+            from JointSpaceVisualizerLib.cache import PreprocessingCache
+            self.cache = PreprocessingCache(cache_dir=self.cache_dir)
+        return self.cache
+
+    def meshCacheDir(self):
+        """Folder of the STL/PLY ingest cache: <cache_dir>/meshes, else in Slicer's cache folder."""
+        import os
+
+        if self.cache_dir:
+            return os.path.join(self.cache_dir, 'meshes')
+        return os.path.join(slicer.app.cachePath, 'JointSpaceVisualizer', 'meshes')
+
+    def loadModel(self, path):
+        """
+        Adds a model file to the scene and returns its node. STL/PLY are parsed once into an
+        indexed binary cache (meshCacheDir) and memory-mapped on later loads; like Slicer's
+        model reader they are read as LPS. Other formats use slicer.util.loadNodeFromFile.
+        """
+        import os
+        from JointSpaceVisualizerLib import mesh_files
+
+        if os.path.splitext(path)[1].lower() not in ('.stl', '.ply'):
+            return slicer.util.loadNodeFromFile(path, 'ModelFile', {})
+        polydata = mesh_files.ingest_polydata(path, self.meshCacheDir(), lps_to_ras=True)
+        node = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLModelNode", os.path.splitext(os.path.basename(path))[0])
+        node.SetAndObservePolyData(polydata)
+        node.CreateDefaultDisplayNodes()
+        return node
+
     def polydata_to_trimesh(self, polydata):
-        """Converts a vtkPolyData object to a trimesh.Trimesh object without PyVista."""
-        import vtk
-        from vtk.util.numpy_support import vtk_to_numpy
+        """Converts a vtkPolyData object to a trimesh.Trimesh object without PyVista (trimesh required)."""
+        from JointSpaceVisualizerLib import mesh_arrays
+
+        return mesh_arrays.to_trimesh(polydata)
+
+    def roiBox(self, roiNode, modelNode=None):
+        """
+        Returns (model_to_roi 4x4, half_size) for a markups ROI node, expressed in the
+        coordinates of modelNode's polydata (its parent linear transform is taken into account).
+        """
         import numpy as np
+        import vtk
 
-        # Ensure triangulated surface (handles polys/quads)
-        tri = vtk.vtkTriangleFilter()
-        tri.SetInputData(polydata)
-        tri.PassLinesOff()
-        tri.PassVertsOff()
-        tri.Update()
-        tri_poly = tri.GetOutput()
-
-        # Points
-        vtk_points = tri_poly.GetPoints()
-        if vtk_points is None or vtk_points.GetNumberOfPoints() == 0:
-            raise ValueError("Input polydata has no points")
-        points = vtk_to_numpy(vtk_points.GetData())
-
-        # Faces (vtkCellArray as [3, i0, i1, i2, 3, ...])
-        vtk_polys = tri_poly.GetPolys()
-        if vtk_polys is None or vtk_polys.GetNumberOfCells() == 0:
-            raise ValueError("Input polydata has no polygons")
-        faces_flat = vtk_to_numpy(vtk_polys.GetData())
+        worldToRoi = vtk.vtkMatrix4x4()
+        vtk.vtkMatrix4x4.Invert(roiNode.GetObjectToWorldMatrix(), worldToRoi)
+        modelToRoi = slicer.util.arrayFromVTKMatrix(worldToRoi)
+        if modelNode is not None and modelNode.GetParentTransformNode() is not None:
+            modelToWorld = vtk.vtkMatrix4x4()
+            slicer.vtkMRMLTransformNode.GetMatrixTransformBetweenNodes(modelNode.GetParentTransformNode(), None, modelToWorld)
+            modelToRoi = modelToRoi @ slicer.util.arrayFromVTKMatrix(modelToWorld)
+        half_size = np.asarray(roiNode.GetSize(), dtype=np.float64) / 2.0
+        return modelToRoi, half_size
+
+    def pipelineArguments(self, sourceNode, targetNode, enable_decimation=False, decimation_value=0.0,
+                          distance_backend='filter', max_distance=None, num_workers=1, crop=False, roiNode=None,
+                          field_spacing=0.5, recorder=None, bidirectional=False, signed=False):
+        """
+        Collects keyword arguments for pipeline.compute_distance_map from the MRML nodes.
+        The models' parent transforms (rigid) are applied: distances are computed in the
+        target's coordinates (source_matrix, see modelToTargetMatrix), like the live preview.
+        Under a non-linear transform the untransformed models are used (with a warning).
+        Must run on the main thread; the pipeline itself may then run on a worker thread.
+        recorder: optional JointSpaceVisualizerLib.perf.StageRecorder, passed on to the pipeline
+        """
+        from JointSpaceVisualizerLib import perf
+
+        logging.info(f"Source model: {sourceNode.GetName()}")
+        logging.info(f"Target model: {targetNode.GetName()}")
+
+        # 1. Get polydata from nodes
+        logging.info("Preparing polydata...")
+        with perf.stage(recorder, "Polydata extraction") as record:
+            source_polydata = sourceNode.GetPolyData()
+            target_polydata = targetNode.GetPolyData()
+            perf.counts(record, 'source', source_polydata)
+            perf.counts(record, 'target', target_polydata)
         try:
-            faces = faces_flat.reshape((-1, 4))[:, 1:4]
-        except Exception:
-            # Fallback: parse sequentially (robust to irregular cell sizes)
-            faces = []
-            i = 0
-            n = faces_flat.size
-            while i < n:
-                cnt = int(faces_flat[i]); i += 1
-                ids = faces_flat[i:i+cnt]; i += cnt
-                if cnt == 3:
-                    faces.append(ids)
-                elif cnt > 3:
-                    # fan triangulation
-                    for k in range(1, cnt-1):
-                        faces.append([ids[0], ids[k], ids[k+1]])
-            faces = np.asarray(faces, dtype=np.int64)
-
-        import trimesh
-        return trimesh.Trimesh(vertices=points, faces=faces, process=False)
-
-    def process(self, sourceNode, targetNode, enable_decimation=False, decimation_value=0.0):
+            source_matrix = self.modelToTargetMatrix(sourceNode, targetNode)
+        except ValueError as e:
+            logging.warning(f"{e}: computing on the untransformed models")
+            source_matrix = None
+        return dict(
+            source_polydata=source_polydata,
+            target_polydata=target_polydata,
+            enable_decimation=enable_decimation,
+            decimation_value=decimation_value,
+            distance_backend=distance_backend,
+            max_distance=max_distance,
+            num_workers=num_workers,
+            cache=self.getCache(),
+            crop=crop,
+            roi=self.roiBox(roiNode, targetNode if source_matrix is not None else sourceNode) if roiNode else None,
+            field_spacing=field_spacing,
+            recorder=recorder,
+            bidirectional=bidirectional,
+            signed=signed,
+            source_matrix=source_matrix,
+        )
+
+    def process(self, sourceNode, targetNode, enable_decimation=False, decimation_value=0.0,
+                distance_backend='filter', max_distance=None, num_workers=1, crop=False, roiNode=None,
+                field_spacing=0.5, progress=None, recorder=None, signed=False):
         """
         Run the actual algorithm
+        distance_backend: 'filter' (vtkDistancePolyDataFilter, exact everywhere),
+        'locator' (cell locator search; with max_distance, farther points get max_distance) or
+        'multires' (decimated proxies select the region below max_distance, refined on the full-resolution
+        meshes; values capped at max_distance, usually slower than a bounded 'locator' search) or
+        'field' (interpolated from a cached voxel distance field of the target, field_spacing mm, up to max_distance)
+        num_workers: worker processes for the locator search ('locator'/'multires' backends)
+        crop: compute only where the models come within max_distance (default 5 mm) of each other
+        roiNode: optional vtkMRMLMarkupsROINode limiting the computed source points (implies crop)
+        signed: negative distances where the source penetrates the target (cell locator search
+        for any backend; the penetration area/volume are part of the contact statistics)
+        progress: optional JointSpaceVisualizerLib.progress.ProgressReporter
+        recorder: optional JointSpaceVisualizerLib.perf.StageRecorder; the per-stage records of
+        the run are also kept in self.lastPerformance
+        The contact statistics of the result (see contactStatistics) are kept in self.lastContactStatistics.
         """
-        # 遅延インポート（VTKのみ使用）
-        import vtk
+        # 遅延インポート（VTK/NumPy のみ使用）
+        from JointSpaceVisualizerLib import perf, pipeline
 
         if not sourceNode or not targetNode:
             logging.error("Input models are not valid.")
             return False
 
-        logging.info(f"Source model: {sourceNode.GetName()}")
-        logging.info(f"Target model: {targetNode.GetName()}")
+        recorder = recorder if recorder is not None else perf.StageRecorder()
+        self.lastPerformance = recorder.records
+        kwargs = self.pipelineArguments(sourceNode, targetNode, enable_decimation, decimation_value,
+                                        distance_backend, max_distance, num_workers, crop, roiNode, field_spacing,
+                                        recorder, signed=signed)
 
-        # 1. Get polydata from nodes
-        logging.info("Preparing polydata...")
-        source_polydata = sourceNode.GetPolyData()
-        target_polydata = targetNode.GetPolyData()
-
-        # Apply decimation if enabled
-        if enable_decimation and decimation_value > 0.0:
-            logging.info(f"Applying decimation to source model (target reduction: {decimation_value:.2f})...")
-            decimate = vtk.vtkQuadricDecimation()
-            decimate.SetInputData(source_polydata)
-            decimate.SetTargetReduction(decimation_value)
-            decimate.Update()
-            source_polydata = decimate.GetOutput()
-
-            logging.info(f"Applying decimation to target model (target reduction: {decimation_value:.2f})...")
-            decimate = vtk.vtkQuadricDecimation()
-            decimate.SetInputData(target_polydata)
-            decimate.SetTargetReduction(decimation_value)
-            decimate.Update()
-            target_polydata = decimate.GetOutput()
-
-        # Log mesh sizes
+        # 2. Decimate (optional) and calculate distances
+        result_polydata = pipeline.compute_distance_map(progress=progress, **kwargs)
+        resultNode, minDistance = self.createResultNode(sourceNode, result_polydata, recorder)
+        self.setResultPose(resultNode, sourceNode, kwargs['source_matrix'])
+        self.lastContactStatistics, _, _ = self.contactStatistics(sourceNode, resultNode, recorder=recorder)
+        return resultNode, minDistance
+
+    def processBidirectional(self, sourceNode, targetNode, enable_decimation=False, decimation_value=0.0,
+                             distance_backend='filter', max_distance=None, num_workers=1, crop=False, roiNode=None,
+                             field_spacing=0.5, progress=None, recorder=None, signed=False):
+        """
+        Like process, but also maps the target by its distance to the source in the same run
+        (shared decimation/cropping, both directions in parallel; see createBidirectionalResultNodes).
+        Returns (sourceResultNode, targetResultNode, summary), or (None, None, None) for invalid input.
+        """
+        from JointSpaceVisualizerLib import perf, pipeline
+
+        if not sourceNode or not targetNode:
+            logging.error("Input models are not valid.")
+            return None, None, None
+
+        recorder = recorder if recorder is not None else perf.StageRecorder()
+        self.lastPerformance = recorder.records
+        kwargs = self.pipelineArguments(sourceNode, targetNode, enable_decimation, decimation_value,
+                                        distance_backend, max_distance, num_workers, crop, roiNode, field_spacing,
+                                        recorder, bidirectional=True, signed=signed)
+        results = pipeline.compute_distance_map(progress=progress, **kwargs)
+        sourceResultNode, targetResultNode, summary = self.createBidirectionalResultNodes(
+            sourceNode, targetNode, results, recorder)
+        self.setResultPose(sourceResultNode, sourceNode, kwargs['source_matrix'])
+        self.setResultPose(targetResultNode, targetNode)
+        self.lastContactStatistics, _, _ = self.contactStatistics(sourceNode, sourceResultNode, recorder=recorder)
+        return sourceResultNode, targetResultNode, summary
+
+    def createBidirectionalResultNodes(self, sourceNode, targetNode, results, recorder=None):
+        """
+        Adds both results of a bidirectional pipeline run as <source>_DistanceMap and
+        <target>_DistanceMap and returns (sourceResultNode, targetResultNode, summary), where
+        summary is pipeline.symmetric_summary (min / mean / Hausdorff over both surfaces).
+        Main thread only.
+        """
+        from JointSpaceVisualizerLib import perf, pipeline
+
+        source_result, target_result = results
+        sourceResultNode, _ = self.createResultNode(sourceNode, source_result, recorder)
+        targetResultNode, _ = self.createResultNode(targetNode, target_result, recorder)
+        with perf.stage(recorder, "Symmetric summary"):
+            summary = pipeline.symmetric_summary(source_result, target_result)
+        if summary is not None:
+            logging.info(f"Symmetric distance: min {summary['min']:.3f} mm, mean {summary['mean']:.3f} mm, "
+                         f"Hausdorff {summary['hausdorff']:.3f} mm (source {summary['source_max']:.3f}, "
+                         f"target {summary['target_max']:.3f})")
+        return sourceResultNode, targetResultNode, summary
+
+    def contactStatistics(self, sourceNode, resultNode, contact_thresholds=None, region_threshold=None,
+                          recorder=None):
+        """
+        Area-weighted statistics of resultNode's Distance array (histogram, percentiles,
+        contact area below each threshold, penetration area/volume/depth of signed results,
+        per connected region closer than region_threshold, default 5 mm; see JointSpaceVisualizerLib.contact.contact_statistics).
+        Returns (stats, tableNode, histogramTableNode); the tables <source>_ContactStatistics
+        (one row for the whole surface, then one per region) and <source>_DistanceHistogram
+        replace older ones. Returns (None, None, None) if there is no Distance array.
+        """
+        import numpy as np
+        import vtk
+        from JointSpaceVisualizerLib import contact, distance, perf
+
+        thresholds = contact.DEFAULT_CONTACT_THRESHOLDS if contact_thresholds is None else contact_thresholds
+        region_threshold = distance.DEFAULT_MAX_DISTANCE if region_threshold is None else float(region_threshold)
+        with perf.stage(recorder, "Contact statistics", result=resultNode.GetPolyData()):
+            stats = contact.polydata_contact_statistics(resultNode.GetPolyData(), contact_thresholds=thresholds,
+                                                        region_threshold=region_threshold)
+        if stats is None:
+            return None, None, None
+
+        def newTable(role, name):
+            return self.replaceOutputNode(sourceNode, role, "vtkMRMLTableNode", name)
+
+        tableNode = newTable(self.CONTACT_TABLE_REFERENCE_ROLE, f"{sourceNode.GetName()}_ContactStatistics")
+        rows = [dict(stats, id="All", side="")] + stats['regions']
+        for name, values in (("Region", [str(r['id']) for r in rows]), ("Side", [r['side'] for r in rows])):
+            column = vtk.vtkStringArray()
+            column.SetName(name)
+            for value in values:
+                column.InsertNextValue(value)
+            tableNode.AddColumn(column)
+        columns = [("Area", lambda r: r['area']), ("MinDistance", lambda r: r['min']),
+                   ("MeanDistance", lambda r: r['mean'])]
+        columns += [(f"P{p:g}", lambda r, p=p: r['percentiles'][p]) for p in stats['percentiles']]
+        columns += [(f"ContactArea<{t:g}mm", lambda r, t=t: r['contact_area'][t]) for t in stats['contact_area']]
+        columns += [("PenetrationArea", lambda r: r['penetration']['area']),
+                    ("PenetrationVolume", lambda r: r['penetration']['volume']),
+                    ("MaxPenetration", lambda r: r['penetration']['depth'])]
+        for name, value in columns:
+            column = vtk.vtkDoubleArray()
+            column.SetName(name)
+            for r in rows:
+                column.InsertNextValue(np.nan if value(r) is None else value(r))
+            tableNode.AddColumn(column)
+        tableNode.Modified()
+
+        histogramNode = newTable(self.HISTOGRAM_TABLE_REFERENCE_ROLE, f"{sourceNode.GetName()}_DistanceHistogram")
+        edges = np.asarray(stats['histogram']['edges'])
+        slicer.util.updateTableFromArray(
+            histogramNode, [edges[:-1], edges[1:], np.asarray(stats['histogram']['area'])],
+            ["BinStart", "BinEnd", "Area"])
+        return stats, tableNode, histogramNode
+
+    def saveDistances(self, resultNode, sourceNode, path, params=None):
+        """
+        Compact save of resultNode (see JointSpaceVisualizerLib.result_files): only the float32
+        distances (every frame of a motion result), the geometry hash of sourceNode's mesh and
+        params. The result must share the source geometry (not decimated).
+        """
+        from JointSpaceVisualizerLib import result_files
+
+        cache = self.getCache()
+        source_hash = cache.key(sourceNode.GetPolyData()) if sourceNode else None
+        if source_hash is None or cache.key(resultNode.GetPolyData()) != source_hash:
+            raise ValueError("The result does not have the Source model's geometry (decimated, or the mesh "
+                             "changed since Apply); save it as VTP instead")
+        result_files.save_result(path, resultNode.GetPolyData(), params, source_hash)
+        logging.info(f"Saved distances of {resultNode.GetName()} to {path}")
+
+    def loadDistances(self, sourceNode, path):
+        """
+        Loads a compact result saved by saveDistances onto sourceNode's mesh (geometry shared,
+        not copied; the geometry hash must match) as <source>_DistanceMap.
+        Returns (resultNode, meta) with meta['params'] holding the saved run options.
+        """
+        from JointSpaceVisualizerLib import result_files
+
+        polydata = sourceNode.GetPolyData()
+        result_polydata, meta = result_files.attach_result(polydata, path, self.getCache().key(polydata))
+        resultNode, _ = self.createResultNode(sourceNode, result_polydata)
+        return resultNode, meta
+
+    def writePerformanceLog(self, path, recorder, sourceNode=None, targetNode=None, options=None):
+        """Appends the run's stage records (with model names and options) as one JSON line to path."""
+        context = {
+            'source': sourceNode.GetName() if sourceNode else None,
+            'target': targetNode.GetName() if targetNode else None,
+            'options': {k: v for k, v in (options or {}).items() if k != 'roiNode'},
+            'total_wall_s': recorder.total_wall_s(),
+        }
         try:
-            sp = source_polydata.GetNumberOfPoints()
-            tp = target_polydata.GetNumberOfPoints()
-            sc = source_polydata.GetNumberOfCells()
-            tc = target_polydata.GetNumberOfCells()
-            logging.info(f"Source points/cells: {sp}/{sc}, Target points/cells: {tp}/{tc}")
-        except Exception:
-            pass
-
-        # 2. Calculate distances using VTK (robust and memory-friendly)
-        logging.info("Calculating distances with vtkDistancePolyDataFilter...")
-        distFilter = vtk.vtkDistancePolyDataFilter()
-        distFilter.SetInputData(0, source_polydata)
-        distFilter.SetInputData(1, target_polydata)
-        distFilter.SignedDistanceOff()  # unsigned distance
-        distFilter.Update()
-
-        result_polydata = distFilter.GetOutput()
-
-        # 3. Create a new model node for the result
-        logging.info("Creating result model...")
-        result_name = f"{sourceNode.GetName()}_DistanceMap"
-        # Check if a node with the same name exists and remove it
-        old_node = None
+            recorder.write_jsonl(path, **context)
+        except OSError as e:
+            logging.warning(f"Failed to write performance log {path}: {e}")
+
+    def sequenceMatrices(self, motion, targetNode=None):
+        """
+        Per-frame 4x4 matrices (source model -> target model coordinates) from a
+        vtkMRMLSequenceNode of linear transforms, a list of transform nodes or a list
+        of 4x4 arrays/vtkMatrix4x4 (each maps the source into world coordinates).
+        """
+        import numpy as np
+        import vtk
+
+        if isinstance(motion, slicer.vtkMRMLSequenceNode):
+            frames = [motion.GetNthDataNode(i) for i in range(motion.GetNumberOfDataNodes())]
+        else:
+            frames = list(motion)
+
+        worldToTarget = np.eye(4)
+        if targetNode is not None and targetNode.GetParentTransformNode() is not None:
+            targetToWorld = vtk.vtkMatrix4x4()
+            if not slicer.vtkMRMLTransformNode.GetMatrixTransformBetweenNodes(targetNode.GetParentTransformNode(), None,
+                                                                              targetToWorld):
+                raise ValueError(f"Transform {targetNode.GetParentTransformNode().GetName()} is not linear")
+            worldToTarget = np.linalg.inv(slicer.util.arrayFromVTKMatrix(targetToWorld))
+
+        matrices = []
+        for frame in frames:
+            if isinstance(frame, slicer.vtkMRMLTransformNode):
+                m = vtk.vtkMatrix4x4()
+                if not frame.GetMatrixTransformToWorld(m):
+                    raise ValueError(f"Transform {frame.GetName()} is not linear")
+                frame = slicer.util.arrayFromVTKMatrix(m)
+            elif isinstance(frame, vtk.vtkMatrix4x4):
+                frame = slicer.util.arrayFromVTKMatrix(frame)
+            matrices.append(worldToTarget @ np.asarray(frame, dtype=np.float64))
+        return matrices
+
+    def processSequence(self, sourceNode, targetNode, motion, max_distance=None, num_workers=1,
+                        contact_thresholds=None, field_spacing=None, progress=None):
+        """
+        Jaw-motion mode: distances from the moving source to the target for every frame.
+        The target locator is built once; per frame only the source points are transformed.
+        motion: see sequenceMatrices (the source node's own parent transform is ignored).
+        field_spacing: interpolate from a distance field of the target instead (see process)
+        Returns (resultNode, tableNode): the result model holds one Distance_NNNN array per
+        frame (frame 0 shown; see showSequenceFrame), the table the per-frame minimum
+        distance and contact areas, which are also plotted.
+        """
+        # 遅延インポート（VTK/NumPy のみ使用）
+        import numpy as np
+        from JointSpaceVisualizerLib import distance, sequence
+
+        if not sourceNode or not targetNode:
+            logging.error("Input models are not valid.")
+            return None, None
+
+        matrices = self.sequenceMatrices(motion, targetNode)
+        if not matrices:
+            logging.error("Motion sequence has no frames.")
+            return None, None
+        cutoff = distance.DEFAULT_MAX_DISTANCE if max_distance is None else float(max_distance)
+        thresholds = sequence.DEFAULT_CONTACT_THRESHOLDS if contact_thresholds is None else contact_thresholds
+        logging.info(f"Calculating distances for {len(matrices)} frames (cutoff: {cutoff} mm, workers: {num_workers})...")
+        result = sequence.sequence_distances(sourceNode.GetPolyData(), targetNode.GetPolyData(), matrices, cutoff,
+                                             thresholds, num_workers, self.getCache(), field_spacing, progress)
+
+        resultNode, _ = self.createResultNode(
+            sourceNode, sequence.attach_frames(sourceNode.GetPolyData(), result['distances']))
+
+        # Per-frame curves
+        table_name = f"{sourceNode.GetName()}_MotionMetrics"
+        tableNode = self.replaceOutputNode(sourceNode, self.MOTION_TABLE_REFERENCE_ROLE, "vtkMRMLTableNode", table_name)
+        areas = [result['contact_area'][float(t)] for t in thresholds]
+        columnNames = ["Frame", "MinDistance"] + [f"ContactArea<{float(t):g}mm" for t in thresholds]
+        slicer.util.updateTableFromArray(
+            tableNode, [np.arange(len(matrices), dtype=np.float64), result['min_distance']] + areas, columnNames)
+
+        # The previous chart goes with its series (they plotted the replaced table)
+        oldChart = sourceNode.GetNodeReference(self.MOTION_CHART_REFERENCE_ROLE)
+        if nodeInScene(oldChart):
+            for seriesNode in [oldChart.GetNthPlotSeriesNode(i) for i in range(oldChart.GetNumberOfPlotSeriesNodes())]:
+                if seriesNode is not None:
+                    slicer.mrmlScene.RemoveNode(seriesNode)
+        chartNode = self.replaceOutputNode(sourceNode, self.MOTION_CHART_REFERENCE_ROLE, "vtkMRMLPlotChartNode",
+                                           f"{table_name} chart")
+        chartNode.SetXAxisTitle("Frame")
+        chartNode.SetYAxisTitle("mm / mm²")
+        for name in columnNames[1:]:
+            seriesNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLPlotSeriesNode", name)
+            seriesNode.SetAndObserveTableNodeID(tableNode.GetID())
+            seriesNode.SetXColumnName("Frame")
+            seriesNode.SetYColumnName(name)
+            seriesNode.SetPlotType(slicer.vtkMRMLPlotSeriesNode.PlotTypeScatter)
+            chartNode.AddAndObservePlotSeriesNodeID(seriesNode.GetID())
         try:
-            old_node = slicer.util.getNode(result_name)
-        except Exception:
-            old_node = None
-        if old_node is not None:
-            slicer.mrmlScene.RemoveNode(old_node)
-        
-        shNode = slicer.vtkMRMLSubjectHierarchyNode.GetSubjectHierarchyNode(slicer.mrmlScene)
-        sourceNodeID = shNode.GetItemByDataNode(sourceNode)
-        parentItemID = shNode.GetItemParent(sourceNodeID)
-
-        resultNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLModelNode", result_name)
-        resultNode.SetAndObservePolyData(result_polydata)
-        shNode.SetItemParent(shNode.GetItemByDataNode(resultNode), parentItemID)
-
-        # 4. Add color information (already added by the filter as 'Distance')
-        logging.info("Distance scalars added by filter. Updating display...")
-
-        # 5. Update the display to show the colors (custom R->Y->G->B, 0..5mm)
-        logging.info("Updating display properties and color mapping (0-5mm, RYGB)...")
-        resultNode.CreateDefaultDisplayNodes()
-        displayNode = resultNode.GetDisplayNode()
-        if displayNode:
-            displayNode.SetScalarVisibility(True)
-            displayNode.SetActiveScalarName("Distance")
-            # Fix scalar range to 0-5mm
-            try:
-                displayNode.SetAutoScalarRange(0)
-            except Exception:
-                pass
-            try:
-                displayNode.SetScalarRange(0.0, 5.0)
-            except Exception:
-                pass
+            slicer.modules.plots.logic().ShowChartInLayout(chartNode)
+        except Exception as e:
+            logging.warning(f"Failed to show motion chart: {e}")
+        return resultNode, tableNode
+
+    def showSequenceFrame(self, resultNode, frame):
+        """Shows the given frame of a processSequence result as the active Distance array."""
+        from JointSpaceVisualizerLib import distance, sequence
+
+        point_data = resultNode.GetPolyData().GetPointData()
+        arr = point_data.GetArray(sequence.FRAME_ARRAY_FORMAT.format(int(frame)))
+        if arr is None:
+            logging.warning(f"Frame {frame} not found on {resultNode.GetName()}")
+            return False
+        point_data.GetArray(distance.DISTANCE_ARRAY_NAME).DeepCopy(arr)
+        point_data.GetArray(distance.DISTANCE_ARRAY_NAME).SetName(distance.DISTANCE_ARRAY_NAME)
+        point_data.Modified()
+        resultNode.GetPolyData().Modified()
+        return True
+
+    def modelToTargetMatrix(self, sourceNode, targetNode):
+        """4x4 matrix from the source model's coordinates into the target model's (parent transforms applied)."""
+        import numpy as np
+
+        parent = sourceNode.GetParentTransformNode()
+        return self.sequenceMatrices([parent if parent is not None else np.eye(4)], targetNode)[0]
+
+    def setResultPose(self, resultNode, sourceNode, matrix=None):
+        """
+        Makes resultNode follow sourceNode's parent transform and records the source -> target
+        matrix its distances were computed for (see resultPoseChanged; None: no known pose).
+        """
+        import numpy as np
+
+        resultNode.SetAndObserveTransformNodeID(sourceNode.GetTransformNodeID())
+        if matrix is None:
+            resultNode.RemoveAttribute(self.RESULT_POSE_ATTRIBUTE)
+            return
+        values = np.asarray(matrix, dtype=np.float64).ravel()
+        resultNode.SetAttribute(self.RESULT_POSE_ATTRIBUTE, " ".join(f"{v:.17g}" for v in values))
+
+    def resultPoseChanged(self, resultNode, sourceNode, targetNode):
+        """
+        True if the source/target transforms changed since resultNode's distances were
+        computed (False if no pose was recorded, e.g. for loaded results).
+        """
+        import numpy as np
+
+        value = resultNode.GetAttribute(self.RESULT_POSE_ATTRIBUTE)
+        if not value:
+            return False
+        recorded = np.array([float(v) for v in value.split()]).reshape((4, 4))
+        try:
+            return not np.allclose(recorded, self.modelToTargetMatrix(sourceNode, targetNode))
+        except ValueError:
+            return True  # now non-linear: the preview reports it
+
+    def livePreviewTracker(self, resultNode, targetNode, max_distance=None, num_workers=1):
+        """
+        Distance tracker for the points of a result model moving against targetNode
+        (cached target locator; see JointSpaceVisualizerLib.sequence.RigidMotionDistance).
+        """
+        from JointSpaceVisualizerLib import distance, pipeline, sequence
+
+        cutoff = distance.DEFAULT_MAX_DISTANCE if max_distance is None else float(max_distance)
+        targetPolyData = targetNode.GetPolyData()
+        locator = pipeline._target_locator(targetPolyData, self.getCache())
+        return sequence.RigidMotionDistance(distance.polydata_points(resultNode.GetPolyData()), locator,
+                                            targetPolyData.GetBounds(), cutoff, num_workers)
+
+    def updateLivePreview(self, tracker, sourceNode, targetNode, resultNode, refine=False):
+        """
+        Updates resultNode's "Distance" array in place for the current source/target transforms
+        (only a subsample is searched unless refine) and returns the minimum distance.
+        The result model follows the source's parent transform; a refined update records its pose.
+        """
+        from vtk.util.numpy_support import vtk_to_numpy
+        from JointSpaceVisualizerLib import distance, sequence
+
+        matrix = self.modelToTargetMatrix(sourceNode, targetNode)
+        if resultNode.GetTransformNodeID() != sourceNode.GetTransformNodeID():
+            resultNode.SetAndObserveTransformNodeID(sourceNode.GetTransformNodeID())
+        subset = None if refine else sequence.preview_subset(len(tracker.points))
+        values = tracker.update(matrix, subset)
+
+        polydata = resultNode.GetPolyData()
+        arr = polydata.GetPointData().GetArray(distance.DISTANCE_ARRAY_NAME)
+        if arr is None or arr.GetNumberOfTuples() != len(values):
+            raise ValueError(f"{resultNode.GetName()} has no matching {distance.DISTANCE_ARRAY_NAME} array")
+        vtk_to_numpy(arr)[:] = values
+        arr.Modified()
+        polydata.Modified()
+        if refine:
+            self.setResultPose(resultNode, sourceNode, matrix)
+        return float(values.min()) if len(values) else None
+
+    def createResultNode(self, sourceNode, result_polydata, recorder=None):
+        """
+        Adds the distance-mapped polydata to the scene as <source>_DistanceMap
+        (replacing an older result) and returns (resultNode, minDistance). Main thread only.
+        recorder: optional JointSpaceVisualizerLib.perf.StageRecorder for the node/colour/min stages
+        """
+        from JointSpaceVisualizerLib import perf, pipeline
+
+        with perf.stage(recorder, "Result node creation", result=result_polydata):
+            # 3. Create a new model node for the result
+            logging.info("Creating result model...")
+            result_name = f"{sourceNode.GetName()}_DistanceMap"
+            shNode = slicer.vtkMRMLSubjectHierarchyNode.GetSubjectHierarchyNode(slicer.mrmlScene)
+            sourceNodeID = shNode.GetItemByDataNode(sourceNode)
+            parentItemID = shNode.GetItemParent(sourceNodeID)
+
+            # The previous result of this source (tracked by node reference) is replaced
+            resultNode = self.replaceOutputNode(sourceNode, self.RESULT_REFERENCE_ROLE, "vtkMRMLModelNode", result_name)
+            resultNode.SetAndObservePolyData(result_polydata)
+            shNode.SetItemParent(shNode.GetItemByDataNode(resultNode), parentItemID)
 
-            # Create or reuse a procedural color node with 0..5 mapping
-            # Updated thresholds: <=1.0mm stays RED, >=4.0mm stays BLUE
+        with perf.stage(recorder, "Min distance"):
+            # Compute min distance (mm) from result scalars
             try:
-                colorNode = slicer.util.getNode('JSV_RYGB_0to5')
+                minDistance = pipeline.min_distance(result_polydata)
             except Exception:
-                colorNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLProceduralColorNode", "JSV_RYGB_0to5")
-            ctf = colorNode.GetColorTransferFunction()
-            ctf.RemoveAllPoints()
-            # Keep red flat from 0 to 1.0 mm
-            ctf.AddRGBPoint(0.0, 1.0, 0.0, 0.0)    # red
-            ctf.AddRGBPoint(1.0, 1.0, 0.0, 0.0)    # red (flat until 1.0)
-            # Transition through yellow and green between 1.0 and 4.0 mm
-            ctf.AddRGBPoint(1.6, 1.0, 1.0, 0.0)    # yellow at 1.6 mm
-            ctf.AddRGBPoint(3.25, 0.0, 1.0, 0.0)   # green
-            # Clamp to blue from 4.0 mm upwards
-            ctf.AddRGBPoint(4.0, 0.0, 0.0, 1.0)    # blue
-            ctf.AddRGBPoint(5.0, 0.0, 0.0, 1.0)    # blue
-            displayNode.SetAndObserveColorNodeID(colorNode.GetID())
-
-        # Compute min distance (mm) from result scalars
-        try:
-            from vtk.util.numpy_support import vtk_to_numpy
-            arr = result_polydata.GetPointData().GetArray('Distance')
-            minDistance = float(vtk_to_numpy(arr).min()) if arr is not None else None
-        except Exception:
-            minDistance = None
+                minDistance = None
+
+        with perf.stage(recorder, "Colour setup"):
+            # 4. Add color information (already added by the filter as 'Distance')
+            logging.info("Distance scalars added by filter. Updating display...")
+
+            # 5. Update the display to show the colors (custom R->Y->G->B, 0..5mm)
+            logging.info("Updating display properties and color mapping (0-5mm, RYGB)...")
+            resultNode.CreateDefaultDisplayNodes()
+            displayNode = resultNode.GetDisplayNode()
+            if displayNode:
+                displayNode.SetScalarVisibility(True)
+                displayNode.SetActiveScalarName("Distance")
+                # Fix scalar range to 0-5mm
+                try:
+                    displayNode.SetAutoScalarRange(0)
+                except Exception:
+                    pass
+                # Signed results: extend the range down to the deepest penetration
+                lower = min(0.0, minDistance) if minDistance is not None else 0.0
+                try:
+                    displayNode.SetScalarRange(lower, 5.0)
+                except Exception:
+                    pass
+
+                # Procedural color node with 0..5 mapping, built once (see distanceColorNode)
+                colorNode = self.distanceColorNode()
+                displayNode.SetAndObserveColorNodeID(colorNode.GetID())
 
         logging.info("Processing finished.")
         return resultNode, minDistance
@@ -0,0 +1,4 @@
+"""
+JointSpaceVisualizer の計算部分（Slicer 非依存）。
+VTK / NumPy のみで動作するため、Slicer 外からも利用できます。
+"""
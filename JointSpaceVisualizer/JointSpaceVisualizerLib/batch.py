@@ -0,0 +1,286 @@
+"""
+複数症例の一括処理（ヘッドレス）。
+
+Slicer 内:   Slicer --no-main-window --python-script JointSpaceVisualizerLib/batch.py manifest.csv -o out
+Slicer 外:   python JointSpaceVisualizerLib/batch.py manifest.csv -o out   (VTK/NumPy が必要)
+
+Manifest: CSV (header: case_id,source,target) または JSON
+([{"case_id": ..., "source": ..., "target": ...}, ...] / {"cases": [...]})。
+相対パスはマニフェストのあるフォルダ基準で解決します。
+モデルは UI と同じく RAS に変換して読み込み（接触統計の左右判定は RAS 前提）、VTP は LPS に戻して書き出します。
+出力: <out>/<case_id>_DistanceMap.vtp（--output-format npz では距離のみの .npz）, <out>/<case_id>.json（パラメータ・集計・接触統計）, <out>/summary.csv
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+
+if __package__ in (None, ''):
+    # Run as a script: make the package importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from JointSpaceVisualizerLib import cache, contact, distance, distance_field, mesh_files, perf, pipeline, result_files
+
+SUMMARY_FIELDS = (
+    'case_id', 'status', 'source', 'target', 'output',
+    'source_points', 'source_cells', 'target_points', 'target_cells', 'result_points',
+    'min_distance', 'penetration_area', 'penetration_volume', 'field_error_max', 'field_error_p95', 'load_s', 'compute_s', 'write_s', 'total_s', 'error',
+)
+
+
+def read_manifest(path):
+    """Returns a list of {'case_id', 'source', 'target'} with absolute paths."""
+    base = os.path.dirname(os.path.abspath(path))
+    if path.lower().endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        rows = data.get('cases', []) if isinstance(data, dict) else data
+    else:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            rows = list(csv.DictReader(f))
+
+    cases = []
+    seen = set()
+    for i, row in enumerate(rows):
+        source = (row.get('source') or '').strip()
+        target = (row.get('target') or '').strip()
+        if not source or not target:
+            raise ValueError(f"Manifest row {i + 1}: 'source' and 'target' are required")
+        case_id = (str(row.get('case_id') or '').strip()
+                   or os.path.splitext(os.path.basename(source))[0])
+        if case_id in seen:
+            raise ValueError(f"Manifest row {i + 1}: duplicate case_id '{case_id}'")
+        seen.add(case_id)
+        cases.append({
+            'case_id': case_id,
+            'source': os.path.normpath(os.path.join(base, source)),
+            'target': os.path.normpath(os.path.join(base, target)),
+        })
+    return cases
+
+
+def _case_paths(case, output_dir, output_format='vtp'):
+    output = os.path.join(output_dir, f"{case['case_id']}_DistanceMap.{output_format}")
+    sidecar = os.path.join(output_dir, f"{case['case_id']}.json")
+    return output, sidecar
+
+
+def is_up_to_date(case, output_dir, params):
+    """True if the case output is newer than its inputs and was made with the same parameters."""
+    output, sidecar = _case_paths(case, output_dir, params.get('output_format', 'vtp'))
+    try:
+        with open(sidecar, encoding='utf-8') as f:
+            record = json.load(f)
+        out_mtime = os.path.getmtime(output)
+        in_mtime = max(os.path.getmtime(case['source']), os.path.getmtime(case['target']))
+    except (OSError, ValueError):
+        return False
+    return (record.get('params') == params
+            and record.get('summary', {}).get('status') == 'done'
+            and out_mtime >= in_mtime)
+
+
+# Model files are LPS; computation and statistics use RAS like the Slicer scene
+_LPS_RAS = ((-1.0, 0.0, 0.0, 0.0), (0.0, -1.0, 0.0, 0.0), (0.0, 0.0, 1.0, 0.0), (0.0, 0.0, 0.0, 1.0))
+
+
+# Per-process preprocessing cache (shared targets across cases are decimated/indexed once)
+_cache = None
+
+
+def _get_cache(cache_dir):
+    global _cache
+    if _cache is None:
+        _cache = cache.PreprocessingCache(max_entries=8, cache_dir=cache_dir)
+    return _cache
+
+
+def run_case(case, output_dir, params, force=False, cache_dir=None, perf_log=None):
+    """
+    Processes one case and returns its summary row (never raises).
+    Models are read as RAS like the module's Load buttons, so the contact statistics
+    (region sides, centroids) are in RAS; the VTP output is written back in LPS.
+    The sidecar JSON holds the per-stage records; perf_log (optional) gets them appended as a JSON line.
+    """
+    output_format = params.get('output_format', 'vtp')
+    output, sidecar = _case_paths(case, output_dir, output_format)
+    row = {'case_id': case['case_id'], 'source': case['source'], 'target': case['target'], 'output': output}
+
+    if not force and is_up_to_date(case, output_dir, params):
+        with open(sidecar, encoding='utf-8') as f:
+            row.update(json.load(f).get('summary', {}))
+        row['status'] = 'skipped'
+        return row
+
+    t_start = time.perf_counter()
+    recorder = perf.StageRecorder()
+    try:
+        with perf.stage(recorder, "Read models") as record:
+            # With a cache dir, STL/PLY are parsed once and memory-mapped afterwards
+            mesh_dir = os.path.join(cache_dir, 'meshes') if cache_dir else None
+            source_polydata = mesh_files.ingest_polydata(case['source'], mesh_dir, lps_to_ras=True)
+            target_polydata = mesh_files.ingest_polydata(case['target'], mesh_dir, lps_to_ras=True)
+            perf.counts(record, 'source', source_polydata)
+            perf.counts(record, 'target', target_polydata)
+        t_loaded = time.perf_counter()
+
+        result_polydata = pipeline.compute_distance_map(
+            source_polydata, target_polydata,
+            params['decimation'] > 0.0, params['decimation'],
+            distance_backend=params['backend'],
+            max_distance=params['max_distance'],
+            num_workers=params['threads'],
+            cache=_get_cache(cache_dir),
+            crop=params.get('crop', False),
+            field_spacing=params.get('field_spacing', distance_field.DEFAULT_SPACING),
+            recorder=recorder,
+            signed=params.get('signed', False),
+        )
+        t_computed = time.perf_counter()
+
+        # Write to a temporary name first so an interrupted run never looks complete
+        with perf.stage(recorder, "Write result", result=result_polydata):
+            if output_format == 'npz':
+                # Distances only, keyed to the source file's geometry
+                result_files.save_result(output, result_polydata, params, cache.geometry_hash(source_polydata))
+            else:
+                tmp_output = output + '.part.vtp'
+                mesh_files.write_polydata(pipeline.transform_polydata(result_polydata, _LPS_RAS), tmp_output)
+                os.replace(tmp_output, output)
+        t_written = time.perf_counter()
+
+        with perf.stage(recorder, "Contact statistics", result=result_polydata):
+            contact_stats = contact.polydata_contact_statistics(result_polydata)
+        field_error = next((r['field_error'] for r in recorder.records if 'field_error' in r), None)
+
+        row.update({
+            'status': 'done',
+            'source_points': source_polydata.GetNumberOfPoints(),
+            'source_cells': source_polydata.GetNumberOfCells(),
+            'target_points': target_polydata.GetNumberOfPoints(),
+            'target_cells': target_polydata.GetNumberOfCells(),
+            'result_points': result_polydata.GetNumberOfPoints(),
+            'min_distance': pipeline.min_distance(result_polydata),
+            'penetration_area': contact_stats['penetration']['area'] if contact_stats else None,
+            'penetration_volume': contact_stats['penetration']['volume'] if contact_stats else None,
+            'field_error_max': field_error['max'] if field_error else None,
+            'field_error_p95': field_error['p95'] if field_error else None,
+            'load_s': round(t_loaded - t_start, 4),
+            'compute_s': round(t_computed - t_loaded, 4),
+            'write_s': round(t_written - t_computed, 4),
+            'total_s': round(t_written - t_start, 4),
+        })
+        with open(sidecar, 'w', encoding='utf-8') as f:
+            json.dump({'params': params, 'summary': row, 'contact': contact_stats, 'field_error': field_error,
+                       'stages': recorder.records}, f, indent=2)
+    except Exception as e:
+        logging.error(f"Case {case['case_id']} failed: {e}")
+        row.update({'status': 'failed', 'error': str(e), 'total_s': round(time.perf_counter() - t_start, 4)})
+    if perf_log:
+        try:
+            recorder.write_jsonl(perf_log, case_id=case['case_id'], status=row['status'], params=params,
+                                 total_wall_s=row.get('total_s'))
+        except OSError as e:
+            logging.warning(f"Failed to write performance log {perf_log}: {e}")
+    return row
+
+
+def run_batch(cases, output_dir, params, workers=1, force=False, summary_path=None, cache_dir=None, perf_log=None):
+    """
+    Processes all cases (process pool if workers > 1) and writes the summary CSV.
+    The pool uses distance.process_context(): never forks Slicer, and spawns PythonSlicer inside it.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    os.makedirs(output_dir, exist_ok=True)
+    rows = {}
+    if workers > 1 and len(cases) > 1:
+        # Submitted by module name: spawned workers cannot import a script's __main__ (e.g. under Slicer)
+        from JointSpaceVisualizerLib.batch import run_case as run_case_in_worker
+        with ProcessPoolExecutor(max_workers=workers, mp_context=distance.process_context()) as pool:
+            futures = {pool.submit(run_case_in_worker, case, output_dir, params, force, cache_dir, perf_log): case
+                       for case in cases}
+            for future in as_completed(futures):
+                row = future.result()
+                rows[row['case_id']] = row
+                logging.info(f"[{len(rows)}/{len(cases)}] {row['case_id']}: {row['status']}")
+    else:
+        for case in cases:
+            row = run_case(case, output_dir, params, force, cache_dir, perf_log)
+            rows[row['case_id']] = row
+            logging.info(f"[{len(rows)}/{len(cases)}] {row['case_id']}: {row['status']}")
+
+    ordered = [rows[case['case_id']] for case in cases]
+    summary_path = summary_path or os.path.join(output_dir, 'summary.csv')
+    with open(summary_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(ordered)
+    return ordered
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Joint Space Visualizer batch processing")
+    parser.add_argument('manifest', help="CSV or JSON list of case_id/source/target")
+    parser.add_argument('-o', '--output-dir', required=True)
+    parser.add_argument('--decimation', type=float, default=0.0,
+                        help="Target reduction in percent (0 = off)")
+    parser.add_argument('--backend', choices=pipeline.DISTANCE_BACKENDS, default='filter')
+    parser.add_argument('--max-distance', type=float, default=None,
+                        help="Cutoff in mm for the locator backend (default: no cutoff); "
+                             "refinement threshold for multires and band of the field backend (default: 5)")
+    parser.add_argument('--crop', action='store_true',
+                        help="Compute only where the models come within the cutoff (default 5 mm)")
+    parser.add_argument('--field-spacing', type=float, default=distance_field.DEFAULT_SPACING,
+                        help="Voxel size in mm of the field backend's target distance field")
+    parser.add_argument('--signed', action='store_true',
+                        help="Signed distances (negative inside the target) with penetration area/volume")
+    parser.add_argument('--threads', type=int, default=1, help="Distance threads per case")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Parallel cases")
+    parser.add_argument('--force', action='store_true', help="Reprocess up-to-date cases")
+    parser.add_argument('--cache-dir', default=None,
+                        help="Persist decimated meshes and parsed STL/PLY models here and reuse them across runs")
+    parser.add_argument('--perf-log', default=None,
+                        help="Append per-stage timing/memory records of each processed case to this JSONL file")
+    parser.add_argument('--output-format', choices=('vtp', 'npz'), default='vtp',
+                        help="npz: store only the float32 distances, keyed to the source mesh "
+                             "(needs full-resolution results: no --decimation unless --backend multires)")
+    parser.add_argument('--summary', default=None, help="Summary CSV path (default: <output-dir>/summary.csv)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    params = {
+        'decimation': max(0.0, min(99.0, args.decimation)) / 100.0,
+        'backend': args.backend,
+        'max_distance': args.max_distance,
+        'threads': max(1, args.threads),
+        'crop': args.crop,
+        # Results of older runs (read as LPS, sides swapped) are not up to date
+        'coordinates': 'RAS',
+    }
+    if args.signed:
+        params['signed'] = True
+    if args.backend == 'field':
+        params['field_spacing'] = args.field_spacing
+    if args.output_format == 'npz':
+        if params['decimation'] > 0.0 and args.backend != 'multires':
+            parser.error("--output-format npz needs full-resolution results (no --decimation, or --backend multires)")
+        params['output_format'] = 'npz'
+    cases = read_manifest(args.manifest)
+    rows = run_batch(cases, args.output_dir, params, max(1, args.workers), args.force, args.summary, args.cache_dir,
+                     args.perf_log)
+    failed = [r['case_id'] for r in rows if r['status'] == 'failed']
+    logging.info(f"{len(rows)} cases, {len(failed)} failed")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    rc = main(sys.argv[1:])
+    try:
+        import slicer
+        slicer.util.exit(rc)
+    except ImportError:
+        sys.exit(rc)
@@ -0,0 +1,239 @@
+"""
+距離計算パイプラインのベンチマーク（合成メッシュ、VTK/NumPy のみ・GUI 不要）。
+
+Slicer 外:   python JointSpaceVisualizerLib/benchmark.py --sizes 10000 200000 --backends locator multires -o bench.json
+Slicer 内:   Slicer --no-main-window --python-script JointSpaceVisualizerLib/benchmark.py ...
+             （結果ノード作成の時間も計測されます）
+
+形状: spheres（離れた 2 球）, tori（積み重ねた 2 トーラス）, noisy（ノイズ付きの顆頭/関節窩状の曲面）
+各段階（decimation, distance, node, min）の実時間とピークメモリを記録し、JSON で出力します。
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+
+if __package__ in (None, ''):
+    # Run as a script: make the package importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from JointSpaceVisualizerLib import distance, perf, pipeline
+
+SHAPES = ('spheres', 'tori', 'noisy')
+DEFAULT_SIZES = (10000, 50000, 200000, 1000000, 2000000)
+GAP = 1.0  # closest nominal distance between the synthetic surfaces (mm)
+
+
+def _sphere(radius, center, n_vertices):
+    import vtk
+
+    res = max(8, int(round(n_vertices ** 0.5)))
+    sphere = vtk.vtkSphereSource()
+    sphere.SetRadius(radius)
+    sphere.SetCenter(*center)
+    sphere.SetThetaResolution(res)
+    sphere.SetPhiResolution(res)
+    sphere.Update()
+    return sphere.GetOutput()
+
+
+def _torus(ring_radius, cross_radius, z, n_vertices):
+    import vtk
+    from vtk.util.numpy_support import vtk_to_numpy
+
+    res = max(8, int(round(n_vertices ** 0.5)))
+    torus = vtk.vtkParametricTorus()
+    torus.SetRingRadius(ring_radius)
+    torus.SetCrossSectionRadius(cross_radius)
+    source = vtk.vtkParametricFunctionSource()
+    source.SetParametricFunction(torus)
+    source.SetUResolution(res)
+    source.SetVResolution(res)
+    source.GenerateTextureCoordinatesOff()
+    source.Update()
+    polydata = vtk.vtkPolyData()
+    polydata.DeepCopy(source.GetOutput())
+    vtk_to_numpy(polydata.GetPoints().GetData())[:, 2] += z
+    polydata.GetPoints().Modified()
+    return polydata
+
+
+def _noisy_dome(n_vertices, z_offset, sign, seed):
+    """Triangulated 40x40 mm grid shaped like a condyle (sign=1) or fossa (sign=-1) with noise."""
+    import numpy as np
+    import vtk
+    from vtk.util.numpy_support import vtk_to_numpy
+
+    res = max(8, int(round(n_vertices ** 0.5)) - 1)
+    plane = vtk.vtkPlaneSource()
+    plane.SetOrigin(-20.0, -20.0, 0.0)
+    plane.SetPoint1(20.0, -20.0, 0.0)
+    plane.SetPoint2(-20.0, 20.0, 0.0)
+    plane.SetResolution(res, res)
+    triangles = vtk.vtkTriangleFilter()
+    triangles.SetInputConnection(plane.GetOutputPort())
+    triangles.Update()
+    polydata = vtk.vtkPolyData()
+    polydata.DeepCopy(triangles.GetOutput())
+    polydata.GetPointData().Initialize()
+
+    points = vtk_to_numpy(polydata.GetPoints().GetData())  # writable view
+    rng = np.random.default_rng(seed)
+    x, y = points[:, 0], points[:, 1]
+    dome = 8.0 * np.exp(-(x ** 2 + y ** 2) / 100.0)
+    ripple = 0.3 * np.sin(x * 0.7 + rng.uniform(0, 6.28)) * np.cos(y * 0.5 + rng.uniform(0, 6.28))
+    points[:, 2] = sign * (dome + ripple) + rng.normal(0.0, 0.05, len(points)) + z_offset
+    polydata.GetPoints().Modified()
+    return polydata
+
+
+def make_pair(shape, n_vertices):
+    """(target, source) synthetic jaw-like pair with about n_vertices points each."""
+    if shape == 'spheres':
+        return _sphere(20.0, (0.0, 0.0, 0.0), n_vertices), _sphere(15.0, (35.0 + GAP, 0.0, 0.0), n_vertices)
+    if shape == 'tori':
+        return _torus(20.0, 6.0, 0.0, n_vertices), _torus(20.0, 6.0, 12.0 + GAP, n_vertices)
+    if shape == 'noisy':
+        # Fossa above the condyle; the apexes are 2*GAP apart before noise
+        return _noisy_dome(n_vertices, 8.0 + 2.0 * GAP + 8.0, -1.0, 1), _noisy_dome(n_vertices, 0.0, 1.0, 2)
+    raise ValueError(f"Unknown shape: {shape}")
+
+
+def _stage(record, name, func):
+    with perf.Stopwatch() as sw:
+        value = func()
+    record['stages'][name] = {
+        'wall_s': round(sw.wall_s, 4),
+        'peak_rss_mb': round(sw.memory.peak / 2 ** 20, 1),
+        'rss_delta_mb': round(sw.memory.delta / 2 ** 20, 1),
+    }
+    return value
+
+
+def _create_node(polydata):
+    """Adds and removes a result model node (Slicer only); None outside Slicer."""
+    try:
+        import slicer
+    except ImportError:
+        return None
+    node = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLModelNode", "JSV_Benchmark")
+    node.SetAndObservePolyData(polydata)
+    node.CreateDefaultDisplayNodes()
+    slicer.mrmlScene.RemoveNode(node)
+    return True
+
+
+def run_case(shape, size, backend, decimation=0.0, max_distance=None, threads=1, field_spacing=None):
+    """Builds one synthetic pair, runs every stage and returns the benchmark record."""
+    target, source = make_pair(shape, size)
+    record = {
+        'shape': shape, 'size': size, 'backend': backend, 'decimation': decimation,
+        'max_distance': max_distance, 'threads': threads,
+        'source_points': source.GetNumberOfPoints(), 'source_cells': source.GetNumberOfCells(),
+        'target_points': target.GetNumberOfPoints(), 'target_cells': target.GetNumberOfCells(),
+        'stages': {},
+    }
+    t_start = time.perf_counter()
+    with perf.PeakMemory() as memory:
+        if decimation > 0.0 and backend != 'multires':
+            source, target = _stage(record, 'decimation', lambda: (
+                pipeline.decimate(source, decimation), pipeline.decimate(target, decimation)))
+        kwargs = {} if field_spacing is None else {'field_spacing': field_spacing}
+        result = _stage(record, 'distance', lambda: pipeline.compute_distance_map(
+            source, target, backend == 'multires' and decimation > 0.0, decimation, backend, max_distance,
+            threads, **kwargs))
+        if _stage(record, 'node', lambda: _create_node(result)) is None:
+            del record['stages']['node']
+        record['min_distance'] = _stage(record, 'min', lambda: pipeline.min_distance(result))
+    record['result_points'] = result.GetNumberOfPoints()
+    record['total_s'] = round(time.perf_counter() - t_start, 4)
+    record['peak_rss_mb'] = round(memory.peak / 2 ** 20, 1)
+    return record
+
+
+def environment():
+    """Machine and library versions stored with the results."""
+    import numpy
+    import vtk
+
+    info = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'vtk': vtk.vtkVersion.GetVTKVersion(),
+        'numpy': numpy.__version__,
+    }
+    try:
+        import subprocess
+        info['commit'] = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                        cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except Exception:
+        pass
+    return info
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Joint Space Visualizer pipeline benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="Approximate vertices per model")
+    parser.add_argument('--shapes', nargs='+', choices=SHAPES, default=list(SHAPES))
+    parser.add_argument('--backends', nargs='+', choices=pipeline.DISTANCE_BACKENDS, default=['locator', 'multires'])
+    parser.add_argument('--decimation', type=float, nargs='+', default=[0.0],
+                        help="Target reductions in percent (0 = off; proxies for multires)")
+    parser.add_argument('--max-distance', type=float, default=distance.DEFAULT_MAX_DISTANCE,
+                        help="Cutoff in mm (0 = exact everywhere for filter/locator)")
+    parser.add_argument('--threads', type=int, nargs='+', default=[1],
+                        help="Worker counts to compare; speedup is relative to the first")
+    parser.add_argument('--field-spacing', type=float, default=None)
+    parser.add_argument('-o', '--output', default=None, help="JSON results file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s %(levelname)s %(message)s')
+    max_distance = args.max_distance if args.max_distance > 0 else None
+    records = []
+    print(f"{'shape':8} {'size':>8} {'backend':9} {'dec%':>5} {'threads':>7} {'points':>9} {'distance_s':>10} "
+          f"{'speedup':>7} {'total_s':>8} {'peak_MB':>8} {'min_mm':>7}")
+    for shape in args.shapes:
+        for size in args.sizes:
+            for backend in args.backends:
+                for decimation in args.decimation:
+                    baseline = None
+                    for threads in args.threads:
+                        try:
+                            record = run_case(shape, size, backend, max(0.0, min(99.0, decimation)) / 100.0,
+                                              max_distance, max(1, threads), args.field_spacing)
+                        except Exception as e:
+                            logging.error(f"{shape}/{size}/{backend}/{threads}: {e}")
+                            record = {'shape': shape, 'size': size, 'backend': backend,
+                                      'decimation': decimation / 100.0, 'threads': threads, 'error': str(e)}
+                        records.append(record)
+                        if 'error' in record:
+                            continue
+                        wall = record['stages']['distance']['wall_s']
+                        baseline = wall if baseline is None else baseline
+                        record['speedup'] = round(baseline / wall, 2) if wall > 0 else None
+                        min_mm = record['min_distance']
+                        print(f"{shape:8} {size:>8} {backend:9} {decimation:>5.0f} {threads:>7} "
+                              f"{record['source_points']:>9} {wall:>10.3f} {record['speedup']!s:>7} "
+                              f"{record['total_s']:>8.3f} {record['peak_rss_mb']:>8.1f} "
+                              f"{min_mm if min_mm is None else round(min_mm, 3)!s:>7}")
+                        sys.stdout.flush()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'environment': environment(), 'params': vars(args), 'results': records}, f, indent=2)
+    return 1 if any('error' in r for r in records) else 0
+
+
+if __name__ == '__main__':
+    rc = main(sys.argv[1:])
+    try:
+        import slicer
+        slicer.util.exit(rc)
+    except ImportError:
+        sys.exit(rc)
@@ -0,0 +1,131 @@
+"""
+前処理結果（デシメーション済みメッシュ、ターゲットロケータ）のキャッシュ。
+キーはポリデータ形状のハッシュ＋パラメータ。メモリ上は LRU、メッシュは任意でディスクにも保存します。
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+
+def geometry_hash(polydata):
+    """Hex digest of the point coordinates and cell connectivity of polydata."""
+    from vtk.util.numpy_support import vtk_to_numpy
+
+    h = hashlib.blake2b(digest_size=16)
+    points = polydata.GetPoints()
+    h.update(b'P%d' % polydata.GetNumberOfPoints())
+    if points is not None and points.GetNumberOfPoints() > 0:
+        data = vtk_to_numpy(points.GetData())
+        h.update(str(data.dtype).encode())
+        h.update(data.tobytes())
+    for tag, cells in ((b'V', polydata.GetVerts()), (b'L', polydata.GetLines()),
+                       (b'F', polydata.GetPolys()), (b'S', polydata.GetStrips())):
+        if cells is None or cells.GetNumberOfCells() == 0:
+            continue
+        h.update(tag)
+        h.update(vtk_to_numpy(cells.GetOffsetsArray()).tobytes())
+        h.update(vtk_to_numpy(cells.GetConnectivityArray()).tobytes())
+    return h.hexdigest()
+
+
+class PreprocessingCache:
+    """
+    LRU cache of preprocessing products keyed by geometry hash.
+    cache_dir (optional) persists polydata entries as VTP so they survive restarts.
+    """
+
+    def __init__(self, max_entries=16, cache_dir=None):
+        self.max_entries = max(1, int(max_entries))
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._hashes = OrderedDict()
+        self._lock = threading.RLock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, polydata):
+        """Geometry hash of polydata, memoised on (object, MTime) to skip rehashing."""
+        memo_key = (polydata.GetAddressAsString('vtkPolyData'), polydata.GetMTime())
+        with self._lock:
+            digest = self._hashes.get(memo_key)
+            if digest is not None:
+                self._hashes.move_to_end(memo_key)
+                return digest
+        digest = geometry_hash(polydata)
+        with self._lock:
+            self._hashes[memo_key] = digest
+            while len(self._hashes) > 4 * self.max_entries:
+                self._hashes.popitem(last=False)
+        return digest
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_create(self, key, factory, persist=False):
+        """
+        Returns the cached value for key, creating it with factory() on a miss.
+        persist=True stores vtkPolyData values in cache_dir as well.
+        Concurrent callers for the same key wait for one factory() call instead of repeating it.
+        """
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                return self._get_or_create(key, factory, persist)
+        finally:
+            with self._lock:
+                self._key_locks.pop(key, None)
+
+    def _get_or_create(self, key, factory, persist):
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        path = self.disk_path(key) if persist else None
+        if path and os.path.isfile(path):
+            from . import mesh_files
+            try:
+                value = mesh_files.read_polydata(path)
+                self.hits += 1
+            except Exception as e:
+                logging.warning(f"Ignoring unreadable cache file {path}: {e}")
+                value = None
+        if value is None:
+            self.misses += 1
+            value = factory()
+            if path:
+                from . import mesh_files
+                try:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    tmp_path = path + '.part.vtp'
+                    mesh_files.write_polydata(value, tmp_path)
+                    os.replace(tmp_path, path)
+                except Exception as e:
+                    logging.warning(f"Failed to persist cache entry {key}: {e}")
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._hashes.clear()
+
+    def disk_path(self, key, ext='.vtp'):
+        """File path for key in cache_dir (None without cache_dir)."""
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, key.replace('/', '_') + ext)
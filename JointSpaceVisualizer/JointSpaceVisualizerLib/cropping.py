@@ -0,0 +1,120 @@
+"""
+距離計算前の関節領域の切り出し（VTK / NumPy のみ使用）。
+打ち切り距離を超えて離れた部分を除外し、計算対象のセル数を減らします。
+"""
+import logging
+
+
+def expand_bounds(bounds, margin):
+    """Grows VTK-style bounds (xmin, xmax, ymin, ymax, zmin, zmax) by margin on every side."""
+    return tuple(b - margin if i % 2 == 0 else b + margin for i, b in enumerate(bounds))
+
+
+def intersect_bounds(a, b):
+    """Intersection of two VTK-style bounds, or None if they do not overlap."""
+    out = []
+    for i in range(0, 6, 2):
+        lo, hi = max(a[i], b[i]), min(a[i + 1], b[i + 1])
+        if lo > hi:
+            return None
+        out += [lo, hi]
+    return tuple(out)
+
+
+def _points_in_bounds(points, bounds):
+    import numpy as np
+
+    lo = np.array(bounds[0::2])
+    hi = np.array(bounds[1::2])
+    return np.all((points >= lo) & (points <= hi), axis=1)
+
+
+def points_in_roi(points, roi):
+    """
+    roi: (to_roi 4x4 matrix, half_size (3,)); to_roi maps point coordinates into the
+    frame of an oriented box centred at its origin. Returns a boolean mask of points inside it.
+    """
+    import numpy as np
+
+    to_roi, half_size = roi
+    m = np.asarray(to_roi, dtype=np.float64)
+    local = points @ m[:3, :3].T + m[:3, 3]
+    return np.all(np.abs(local) <= np.asarray(half_size, dtype=np.float64), axis=1)
+
+
+def extract_cells(polydata, points, cell_mask, offsets, conn):
+    """
+    New polydata with only the masked polygons and the points they use.
+    Returns (polydata, original point ids).
+    """
+    import numpy as np
+    from . import mesh_arrays
+
+    sizes = np.diff(offsets)
+    keep_sizes = sizes[cell_mask]
+    keep_conn = conn[np.repeat(cell_mask, sizes)]
+    point_ids, new_conn = np.unique(keep_conn, return_inverse=True)
+    new_offsets = np.concatenate(([0], np.cumsum(keep_sizes)))
+
+    # The new arrays are owned by the polydata from here on (no further copy)
+    out = mesh_arrays.polydata_from_arrays(points[point_ids], offsets=new_offsets, connectivity=new_conn.ravel())
+    return out, point_ids
+
+
+def _cells_overlapping(points, offsets, conn, bounds):
+    """Mask of polygons whose bounding box overlaps bounds."""
+    import numpy as np
+
+    cell_points = points[conn]
+    starts = offsets[:-1]
+    if len(starts) == 0:
+        return np.zeros(0, dtype=bool)
+    cmin = np.minimum.reduceat(cell_points, starts, axis=0)
+    cmax = np.maximum.reduceat(cell_points, starts, axis=0)
+    lo = np.array(bounds[0::2])
+    hi = np.array(bounds[1::2])
+    return np.all((cmax >= lo) & (cmin <= hi), axis=1)
+
+
+def crop_both(source_polydata, target_polydata, cutoff, roi=None):
+    """
+    Keeps only the parts of both models that can be closer than cutoff.
+    Source: polygons touching a point inside the target bounds grown by cutoff (and inside roi).
+    Target: polygons overlapping the bounds of the kept source points grown by cutoff, so
+    every target point closer than cutoff to the kept source is kept and the same crop
+    serves the target -> source direction.
+    Returns (cropped source, source point ids, cropped target, target point ids); the
+    cropped models are None when no source point can be closer than cutoff.
+    """
+    import numpy as np
+    from . import distance, mesh_arrays
+
+    source_points = distance.polydata_points(source_polydata)
+    target_points = distance.polydata_points(target_polydata)
+    empty = np.zeros(0, dtype=np.int64)
+
+    point_mask = _points_in_bounds(source_points, expand_bounds(target_polydata.GetBounds(), cutoff))
+    if roi is not None:
+        point_mask &= points_in_roi(source_points, roi)
+    if not point_mask.any():
+        logging.info("Crop: no source points within cutoff of the target")
+        return None, empty, None, empty
+
+    offsets, conn = mesh_arrays.polygons(source_polydata)
+    source_cells = np.maximum.reduceat(point_mask[conn], offsets[:-1]) if len(conn) else np.zeros(0, dtype=bool)
+    cropped_source, point_ids = extract_cells(source_polydata, source_points, source_cells, offsets, conn)
+    if len(point_ids) == 0:
+        return None, point_ids, None, empty
+
+    kept = source_points[point_ids]
+    kept_bounds = (kept[:, 0].min(), kept[:, 0].max(), kept[:, 1].min(),
+                   kept[:, 1].max(), kept[:, 2].min(), kept[:, 2].max())
+    offsets, conn = mesh_arrays.polygons(target_polydata)
+    target_cells = _cells_overlapping(target_points, offsets, conn, expand_bounds(kept_bounds, cutoff))
+    cropped_target, target_ids = extract_cells(target_polydata, target_points, target_cells, offsets, conn)
+
+    logging.info(f"Crop: source {len(point_ids)}/{len(source_points)} points, "
+                 f"target {int(target_cells.sum())}/{len(target_cells)} cells")
+    if cropped_target.GetNumberOfCells() == 0:
+        return None, empty, None, empty
+    return cropped_source, point_ids, cropped_target, target_ids
@@ -0,0 +1,318 @@
+"""
+点→面の距離計算バックエンド（VTK / NumPy のみ使用）。
+"""
+import logging
+
+DISTANCE_ARRAY_NAME = "Distance"
+
+# Colour map saturates to blue at 5 mm; distances beyond it are never shown.
+DEFAULT_MAX_DISTANCE = 5.0
+
+
+def triangulate(polydata):
+    """Returns a triangle-only copy of polydata (lines/verts dropped)."""
+    import vtk
+
+    tri = vtk.vtkTriangleFilter()
+    tri.SetInputData(polydata)
+    tri.PassLinesOff()
+    tri.PassVertsOff()
+    tri.Update()
+    return tri.GetOutput()
+
+
+def build_target_locator(polydata):
+    """Builds a static cell locator over the triangulated target surface."""
+    import vtk
+
+    tri_poly = triangulate(polydata)
+    if tri_poly.GetNumberOfCells() == 0:
+        raise ValueError("Target polydata has no polygons")
+    locator = vtk.vtkStaticCellLocator()
+    locator.SetDataSet(tri_poly)
+    locator.BuildLocator()
+    return locator
+
+
+def polydata_points(polydata):
+    """Returns the points of polydata as an (N, 3) float64 NumPy array."""
+    import numpy as np
+    from . import mesh_arrays
+
+    return mesh_arrays.points(polydata, np.float64)
+
+
+def closest_distances(points, locator, max_distance=None, with_closest=False):
+    """
+    Unsigned distance from each point to the surface held by locator.
+    With max_distance, the search radius is bounded and points farther away
+    get exactly max_distance (i.e. ">= cutoff") instead of an exact value.
+    with_closest: also return the closest surface points (N, 3) and their cell ids
+    (-1 where nothing was found within max_distance), as (distances, closest, cell_ids).
+    """
+    import numpy as np
+    import vtk
+
+    pts = np.asarray(points, dtype=np.float64).tolist()
+    out = np.empty(len(pts), dtype=np.float64)
+    if with_closest:
+        closest_out = np.zeros((len(pts), 3), dtype=np.float64)
+        cell_out = np.full(len(pts), -1, dtype=np.int64)
+    cell = vtk.vtkGenericCell()
+    closest = [0.0, 0.0, 0.0]
+    cellId = vtk.reference(0)
+    subId = vtk.reference(0)
+    dist2 = vtk.reference(0.0)
+
+    if max_distance is None:
+        find = locator.FindClosestPoint
+        for i, p in enumerate(pts):
+            find(p, closest, cell, cellId, subId, dist2)
+            out[i] = float(dist2)
+            if with_closest:
+                closest_out[i] = closest
+                cell_out[i] = int(cellId)
+    else:
+        radius = float(max_distance)
+        radius2 = radius * radius
+        inside = vtk.reference(0)
+        find = locator.FindClosestPointWithinRadius
+        for i, p in enumerate(pts):
+            if find(p, radius, closest, cell, cellId, subId, dist2, inside):
+                out[i] = min(float(dist2), radius2)
+                if with_closest:
+                    closest_out[i] = closest
+                    cell_out[i] = int(cellId)
+            else:
+                out[i] = radius2
+    np.sqrt(out, out=out)
+    if with_closest:
+        return out, closest_out, cell_out
+    return out
+
+
+def default_num_workers():
+    import os
+
+    return max(1, os.cpu_count() or 1)
+
+
+def locator_faces(locator):
+    """Returns (points, triangles) of the triangulated surface a locator was built on."""
+    import numpy as np
+    from . import mesh_arrays
+
+    tri_poly = locator.GetDataSet()
+    return polydata_points(tri_poly), np.asarray(mesh_arrays.triangles(tri_poly), dtype=np.int64)
+
+
+def _chunk_bounds(n, num_workers, chunk_size=None):
+    # More chunks than workers keeps the pool balanced when near-contact points cluster;
+    # the upper cap keeps progress updates and cancellation responsive.
+    if chunk_size is None:
+        chunk_size = min(8192, max(1024, -(-n // (num_workers * 4))))
+    return [(start, min(n, start + chunk_size)) for start in range(0, n, chunk_size)]
+
+
+# Per-process locator for the process pool (built once per worker by the initializer)
+_worker_locator = None
+
+# The wrapped FindClosestPoint* calls hold the GIL (VTK wheels are not built with
+# VTK_PYTHON_FULL_THREADSAFE), so threads cannot run queries concurrently: parallel runs use
+# worker processes. Below this many points their startup/transfer costs more than it saves.
+PROCESS_MIN_POINTS = 20000
+
+# Live process pools: [locator, n_workers, pool], most recent last. Two slots let both
+# directions of a bidirectional run (and repeated Apply / live preview) reuse their workers.
+_POOL_SLOTS = 2
+_pools = []
+_pools_lock = None
+
+
+def _init_worker(points, faces):
+    global _worker_locator
+    import vtk
+    from . import mesh_arrays
+
+    locator = vtk.vtkStaticCellLocator()
+    locator.SetDataSet(mesh_arrays.polydata_from_arrays(points, faces))
+    locator.BuildLocator()
+    _worker_locator = locator
+
+
+def _worker_distances(points, max_distance, with_closest=False):
+    return closest_distances(points, _worker_locator, max_distance, with_closest)
+
+
+def _concatenate(parts):
+    import numpy as np
+
+    if parts and isinstance(parts[0], tuple):
+        return tuple(np.concatenate(column) for column in zip(*parts))
+    return np.concatenate(parts)
+
+
+def process_context():
+    """
+    'spawn' multiprocessing context: forking the Slicer application (Qt threads) is unsafe.
+    Inside Slicer, sys.executable is the application, so workers start with PythonSlicer.
+    """
+    import multiprocessing
+    import os
+    import shutil
+    import sys
+
+    context = multiprocessing.get_context('spawn')
+    if not os.path.basename(sys.executable).lower().startswith('python'):
+        folder = os.path.dirname(sys.executable)
+        candidates = [os.path.join(folder, name) for name in ('PythonSlicer', 'PythonSlicer.exe')]
+        python = next((c for c in candidates if os.path.isfile(c)), None) or shutil.which('PythonSlicer')
+        if python is None:
+            raise RuntimeError(f"No Python interpreter found for worker processes (executable: {sys.executable})")
+        context.set_executable(python)
+    return context
+
+
+def _process_pool(locator, n_workers):
+    """Process pool whose workers hold a copy of locator's surface; kept for reuse (see shutdown_pools)."""
+    global _pools_lock
+    import atexit
+    import threading
+    from concurrent.futures import ProcessPoolExecutor
+
+    if _pools_lock is None:
+        _pools_lock = threading.Lock()
+        atexit.register(shutdown_pools)
+    with _pools_lock:
+        for slot in _pools:
+            if slot[0] is locator and slot[1] == n_workers:
+                _pools.remove(slot)
+                _pools.append(slot)
+                return slot[2]
+        tri_points, tri_faces = locator_faces(locator)
+        pool = ProcessPoolExecutor(max_workers=n_workers, mp_context=process_context(), initializer=_init_worker,
+                                   initargs=(tri_points, tri_faces))
+        _pools.append([locator, n_workers, pool])
+        while len(_pools) > _POOL_SLOTS:
+            _pools.pop(0)[2].shutdown(wait=False, cancel_futures=True)
+        return pool
+
+
+def _discard_pool(locator):
+    # A worker died (e.g. out of memory): the pool is unusable, start fresh next time
+    with _pools_lock:
+        for slot in [slot for slot in _pools if slot[0] is locator]:
+            _pools.remove(slot)
+            slot[2].shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pools():
+    """Stops the worker processes kept by parallel_closest_distances."""
+    while _pools:
+        _pools.pop()[2].shutdown(wait=False, cancel_futures=True)
+
+
+def parallel_closest_distances(points, locator, max_distance=None, num_workers=None,
+                               executor=None, chunk_size=None, progress=None, with_closest=False):
+    """
+    closest_distances() split into chunks and evaluated by a worker pool.
+    executor='process' runs the chunks in worker processes that rebuild the locator once and
+    are kept for later calls with the same locator; executor='thread' shares the locator
+    between threads, which only helps if the VTK build releases the GIL. The default (None)
+    uses processes for num_workers > 1 and at least PROCESS_MIN_POINTS points, else the
+    calling thread.
+    progress: optional progress.ProgressReporter, updated per chunk (cancellation
+    is checked between chunks). with_closest: as in closest_distances.
+    """
+    import numpy as np
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+    from concurrent.futures.process import BrokenProcessPool
+
+    pts = np.asarray(points, dtype=np.float64)
+    n_workers = default_num_workers() if num_workers is None else max(1, int(num_workers))
+    if executor is None:
+        executor = 'process'
+        if len(pts) < PROCESS_MIN_POINTS:
+            n_workers = 1
+    bounds = _chunk_bounds(len(pts), n_workers, chunk_size)
+    process_pool = None
+    if executor == 'process' and n_workers > 1 and len(bounds) > 1:
+        try:
+            process_pool = _process_pool(locator, n_workers)
+        except (OSError, RuntimeError) as e:
+            logging.warning(f"Worker processes unavailable, computing in this thread: {e}")
+            n_workers = 1
+            bounds = _chunk_bounds(len(pts), n_workers, chunk_size)
+    if len(bounds) <= 1 or (n_workers == 1 and progress is None):
+        return closest_distances(pts, locator, max_distance, with_closest)
+
+    if n_workers == 1:
+        parts = []
+        for a, b in bounds:
+            parts.append(closest_distances(pts[a:b], locator, max_distance, with_closest))
+            progress.update(b / len(pts))
+        return _concatenate(parts)
+
+    logging.info(f"Parallel distance: {len(pts)} points, {len(bounds)} chunks, {n_workers} {executor} workers")
+    if executor == 'thread':
+        pool = ThreadPoolExecutor(max_workers=n_workers)
+        futures = [pool.submit(closest_distances, pts[a:b], locator, max_distance, with_closest) for a, b in bounds]
+    elif executor == 'process':
+        pool = None  # kept for the next call
+        futures = [process_pool.submit(_worker_distances, pts[a:b], max_distance, with_closest) for a, b in bounds]
+    else:
+        raise ValueError(f"Unknown executor: {executor}")
+
+    try:
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for f in done:
+                f.result()  # re-raise worker errors early
+            if progress is not None:
+                progress.update(1.0 - len(pending) / len(futures))
+    except BaseException as e:
+        for f in futures:
+            f.cancel()
+        if isinstance(e, BrokenProcessPool):
+            _discard_pool(locator)
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+    return _concatenate([f.result() for f in futures])
+
+
+def attach_distances(polydata, distances, name=DISTANCE_ARRAY_NAME):
+    """Returns a copy of polydata carrying distances as active point scalars."""
+    import numpy as np
+    import vtk
+    from vtk.util.numpy_support import numpy_to_vtk
+
+    # Deep copy: the result node must not share points with the (possibly cached) input mesh
+    result = vtk.vtkPolyData()
+    result.DeepCopy(polydata)
+    arr = numpy_to_vtk(np.ascontiguousarray(distances, dtype=np.float64), deep=1)
+    arr.SetName(name)
+    pd = result.GetPointData()
+    pd.RemoveArray(name)
+    pd.AddArray(arr)
+    pd.SetActiveScalars(name)
+    return result
+
+
+def locator_distance(source_polydata, target_polydata, max_distance=DEFAULT_MAX_DISTANCE,
+                     num_workers=1, executor=None, locator=None, progress=None):
+    """
+    Cell-locator backend: exact distances below max_distance, clamped above it
+    (max_distance=None searches without a cutoff).
+    locator: prebuilt build_target_locator(target_polydata) result to reuse.
+    Returns the source geometry with a "Distance" point array.
+    """
+    if locator is None:
+        locator = build_target_locator(target_polydata)
+    points = polydata_points(source_polydata)
+    logging.info(f"Locator distance: {len(points)} points, cutoff={max_distance}")
+    distances = parallel_closest_distances(points, locator, max_distance, num_workers, executor,
+                                           progress=progress)
+    return attach_distances(source_polydata, distances)
@@ -0,0 +1,127 @@
+"""
+VTK ポリデータ ⇔ NumPy 配列の変換（VTK 9 のオフセット/接続配列を使い、可能な限りゼロコピー）。
+混在ポリゴン（三角形/四角形/ストリップ）の三角形分割も NumPy でベクトル化しています。
+trimesh の有無に関わらず NumPy ベースの処理から利用できます。
+"""
+
+
+def points(polydata, dtype=None):
+    """
+    (N, 3) view of the points of polydata (no copy unless dtype differs from the storage).
+    Raises ValueError if there are no points.
+    """
+    import numpy as np
+    from vtk.util.numpy_support import vtk_to_numpy
+
+    vtk_points = polydata.GetPoints()
+    if vtk_points is None or vtk_points.GetNumberOfPoints() == 0:
+        raise ValueError("Input polydata has no points")
+    view = vtk_to_numpy(vtk_points.GetData())
+    return view if dtype is None else np.asarray(view, dtype=dtype)
+
+
+def cell_arrays(cells):
+    """(offsets, connectivity) views of a vtkCellArray (offsets has one entry more than cells)."""
+    import numpy as np
+    from vtk.util.numpy_support import vtk_to_numpy
+
+    if cells is None or cells.GetNumberOfCells() == 0:
+        return np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return vtk_to_numpy(cells.GetOffsetsArray()), vtk_to_numpy(cells.GetConnectivityArray())
+
+
+def fan_triangles(offsets, connectivity):
+    """
+    Triangles (M, 3) of polygons given as offsets/connectivity, fan-triangulated from
+    each polygon's first vertex (exact for convex polygons such as quads). Cells with
+    fewer than 3 points are dropped. All-triangle input is returned as a view.
+    """
+    import numpy as np
+
+    sizes = np.diff(offsets)
+    if len(sizes) and np.all(sizes == 3):
+        return connectivity.reshape((-1, 3))
+    ntri = np.maximum(sizes - 2, 0)
+    first = np.repeat(offsets[:-1], ntri)
+    k = np.arange(int(ntri.sum())) - np.repeat(np.cumsum(ntri) - ntri, ntri)
+    return np.stack((connectivity[first], connectivity[first + k + 1], connectivity[first + k + 2]), axis=1)
+
+
+def strip_triangles(offsets, connectivity):
+    """Triangles (M, 3) of triangle strips, with every other triangle flipped to keep the orientation."""
+    import numpy as np
+
+    sizes = np.diff(offsets)
+    ntri = np.maximum(sizes - 2, 0)
+    start = np.repeat(offsets[:-1], ntri)
+    k = np.arange(int(ntri.sum())) - np.repeat(np.cumsum(ntri) - ntri, ntri)
+    a, b, c = start + k, start + k + 1, start + k + 2
+    odd = (k % 2) == 1
+    a, b = np.where(odd, b, a), np.where(odd, a, b)
+    return np.stack((connectivity[a], connectivity[b], connectivity[c]), axis=1)
+
+
+def polygons(polydata):
+    """
+    (offsets, connectivity) of the surface cells: the polygons as views, with triangle
+    strips (if any) appended as triangles. Verts and lines are ignored.
+    """
+    import numpy as np
+
+    offsets, conn = cell_arrays(polydata.GetPolys())
+    if polydata.GetNumberOfStrips() == 0:
+        return offsets, conn
+    strips = strip_triangles(*cell_arrays(polydata.GetStrips())).astype(conn.dtype, copy=False)
+    conn = np.concatenate((conn, strips.ravel()))
+    offsets = np.concatenate((offsets, offsets[-1] + 3 * np.arange(1, len(strips) + 1, dtype=offsets.dtype)))
+    return offsets, conn
+
+
+def triangles(polydata):
+    """(M, 3) triangle point ids of the surface; a view of the connectivity for triangle meshes."""
+    return fan_triangles(*polygons(polydata))
+
+
+def polydata_from_arrays(points, faces=None, offsets=None, connectivity=None):
+    """
+    vtkPolyData sharing the given NumPy buffers (no copy when points are contiguous
+    float32/float64 and ids are int64). Cells are faces (M, k) or offsets/connectivity.
+    The arrays must not be resized while the polydata is in use.
+    """
+    import numpy as np
+    import vtk
+    from vtk.util.numpy_support import numpy_to_vtk, numpy_to_vtkIdTypeArray
+
+    pts = np.asarray(points)
+    if pts.dtype not in (np.float32, np.float64):
+        pts = pts.astype(np.float64)
+    pts = np.ascontiguousarray(pts.reshape((-1, 3)))
+    polydata = vtk.vtkPolyData()
+    vtk_points = vtk.vtkPoints()
+    vtk_points.SetData(numpy_to_vtk(pts, deep=0))
+    polydata.SetPoints(vtk_points)
+
+    if faces is not None:
+        faces = np.asarray(faces)
+        connectivity = faces.reshape(-1)
+        offsets = np.arange(0, faces.size + 1, max(1, faces.shape[1] if faces.ndim == 2 else 3))
+    if connectivity is not None:
+        id_type = np.int64 if vtk.vtkIdTypeArray().GetDataTypeSize() == 8 else np.int32
+        cells = vtk.vtkCellArray()
+        cells.SetData(numpy_to_vtkIdTypeArray(np.ascontiguousarray(offsets, dtype=id_type), deep=0),
+                      numpy_to_vtkIdTypeArray(np.ascontiguousarray(connectivity, dtype=id_type), deep=0))
+        polydata.SetPolys(cells)
+    return polydata
+
+
+def to_trimesh(polydata):
+    """
+    trimesh.Trimesh of the triangulated surface (vertices/faces shared where possible).
+    Requires the optional trimesh package.
+    """
+    import trimesh
+
+    faces = triangles(polydata)
+    if len(faces) == 0:
+        raise ValueError("Input polydata has no polygons")
+    return trimesh.Trimesh(vertices=points(polydata), faces=faces, process=False)
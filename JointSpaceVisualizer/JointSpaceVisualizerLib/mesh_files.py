@@ -0,0 +1,170 @@
+"""
+モデルファイル（STL/PLY/VTP/VTK）の読み書き（VTK のみ使用）。
+"""
+import os
+
+_READERS = {
+    '.stl': 'vtkSTLReader',
+    '.ply': 'vtkPLYReader',
+    '.vtp': 'vtkXMLPolyDataReader',
+    '.vtk': 'vtkPolyDataReader',
+}
+
+_WRITERS = {
+    '.stl': 'vtkSTLWriter',
+    '.ply': 'vtkPLYWriter',
+    '.vtp': 'vtkXMLPolyDataWriter',
+    '.vtk': 'vtkPolyDataWriter',
+}
+
+
+def read_polydata(path):
+    """Reads a surface model file into vtkPolyData."""
+    import vtk
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in _READERS:
+        raise ValueError(f"Unsupported model file type: {path}")
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Model file not found: {path}")
+    reader = getattr(vtk, _READERS[ext])()
+    reader.SetFileName(path)
+    reader.Update()
+    polydata = vtk.vtkPolyData()
+    polydata.ShallowCopy(reader.GetOutput())
+    if polydata.GetNumberOfPoints() == 0:
+        raise ValueError(f"No points read from {path}")
+    return polydata
+
+
+def write_polydata(polydata, path):
+    """Writes vtkPolyData; the format follows the file extension (binary where supported)."""
+    import vtk
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in _WRITERS:
+        raise ValueError(f"Unsupported model file type: {path}")
+    writer = getattr(vtk, _WRITERS[ext])()
+    writer.SetFileName(path)
+    writer.SetInputData(polydata)
+    if ext == '.vtp':
+        writer.SetDataModeToAppended()
+        writer.SetCompressorTypeToZLib()
+    elif hasattr(writer, 'SetFileTypeToBinary'):
+        writer.SetFileTypeToBinary()
+    if not writer.Write():
+        raise IOError(f"Failed to write {path}")
+
+
+# Bump when the layout of the ingest cache changes
+INGEST_CACHE_VERSION = 2
+
+
+def read_binary_stl(path):
+    """
+    (points float32 (N, 3), triangles int64 (M, 3)) of a binary STL with duplicate
+    vertices merged (exact coordinate matches) and degenerate triangles dropped.
+    Vertices are numbered in order of first appearance, as vtkSTLReader does, so the
+    mesh is identical to read_polydata's (same geometry hash, distances per vertex).
+    Returns None if path is not a binary STL.
+    """
+    import numpy as np
+
+    size = os.path.getsize(path)
+    if size < 84:
+        return None
+    with open(path, 'rb') as f:
+        f.seek(80)
+        count = int(np.frombuffer(f.read(4), dtype='<u4')[0])
+    if size != 84 + 50 * count:
+        return None
+    record = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attr', '<u2')])
+    soup = np.fromfile(path, dtype=record, count=count, offset=84)['vertices'].reshape((-1, 3))
+    merged = soup + np.float32(0.0)  # -0.0 -> 0.0 so equal coordinates have equal bytes
+    keys = np.ascontiguousarray(merged).view(np.dtype((np.void, merged.dtype.itemsize * 3))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    first = first[order]
+    triangles = rank[inverse.ravel()].reshape((-1, 3)).astype(np.int64)
+    keep = (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) & \
+           (triangles[:, 0] != triangles[:, 2])
+    return np.ascontiguousarray(soup[first]), np.ascontiguousarray(triangles[keep])
+
+
+def _ingest_key(path, lps_to_ras):
+    """(prefix for path, full key for its current mtime/size) of the ingest cache."""
+    import hashlib
+
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    prefix = hashlib.blake2b(os.path.normcase(path).encode('utf-8'), digest_size=8).hexdigest()
+    version = hashlib.blake2b(f"{stat.st_mtime_ns}/{stat.st_size}/{int(lps_to_ras)}/{INGEST_CACHE_VERSION}".encode(),
+                              digest_size=8).hexdigest()
+    return prefix, f"{prefix}-{version}"
+
+
+def ingest_polydata(path, cache_dir=None, lps_to_ras=False):
+    """
+    Reads a surface model like read_polydata, but STL/PLY files are parsed once into an
+    indexed binary cache in cache_dir (<key>.points.npy / <key>.faces.npy, keyed by path,
+    mtime and size). Later calls memory-map the cache and share it with the polydata.
+    Older cache entries of the same path are removed. Without cache_dir (or for
+    VTP/VTK) this is read_polydata.
+    lps_to_ras: negate x and y, for Slicer scenes (model files are LPS by default).
+    """
+    import logging
+    import numpy as np
+    from . import mesh_arrays
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in _READERS:
+        raise ValueError(f"Unsupported model file type: {path}")
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Model file not found: {path}")
+
+    base = None
+    if cache_dir and ext in ('.stl', '.ply'):
+        prefix, key = _ingest_key(path, lps_to_ras)
+        base = os.path.join(cache_dir, key)
+        if os.path.isfile(base + '.faces.npy'):
+            try:
+                # Copy-on-write mapping: pages load lazily and VTK gets a writable buffer
+                points = np.load(base + '.points.npy', mmap_mode='c')
+                faces = np.load(base + '.faces.npy', mmap_mode='c')
+                return mesh_arrays.polydata_from_arrays(points, faces)
+            except Exception as e:
+                logging.warning(f"Ignoring unreadable mesh cache {base}: {e}")
+
+    if base is None:
+        polydata = read_polydata(path)
+        if lps_to_ras:
+            mesh_arrays.points(polydata)[:, :2] *= -1  # view of the freshly read points
+            polydata.GetPoints().Modified()
+        return polydata
+
+    parsed = read_binary_stl(path) if ext == '.stl' else None
+    if parsed is None:
+        polydata = read_polydata(path)
+        parsed = (np.array(mesh_arrays.points(polydata)), np.asarray(mesh_arrays.triangles(polydata), dtype=np.int64))
+    points, faces = parsed
+    if len(faces) == 0:
+        raise ValueError(f"No triangles read from {path}")
+    if lps_to_ras:
+        points[:, :2] *= -1
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        for old in os.listdir(cache_dir):
+            if old.startswith(prefix + '-') and not old.startswith(key):
+                os.remove(os.path.join(cache_dir, old))
+        # Per-process temporary names: batch workers may ingest the same file at once
+        for name, values in (('points', points), ('faces', faces)):
+            np.save(f"{base}.{name}.{os.getpid()}.part.npy", values)
+        # faces last: its presence marks a complete entry
+        for name in ('points', 'faces'):
+            os.replace(f"{base}.{name}.{os.getpid()}.part.npy", f"{base}.{name}.npy")
+    except OSError as e:
+        logging.warning(f"Failed to write mesh cache for {path}: {e}")
+    return mesh_arrays.polydata_from_arrays(points, faces)
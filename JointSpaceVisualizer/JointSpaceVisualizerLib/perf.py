@@ -0,0 +1,146 @@
+"""
+処理時間・メモリ使用量の計測（ベンチマークと処理ログ用）。
+"""
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+
+def current_rss():
+    """
+    Resident set size of this process in bytes. Uses /proc on Linux; elsewhere falls
+    back to the peak RSS from the resource module (0 if neither is available).
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except Exception:
+        return 0
+
+
+class PeakMemory:
+    """
+    Context manager sampling the RSS in a background thread.
+    start/peak are in bytes; delta is the growth above the RSS at entry.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.start = 0
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def delta(self):
+        return max(0, self.peak - self.start)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self.start = self.peak = current_rss()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+        return False
+
+
+class Stopwatch:
+    """Wall time and peak memory of a block: with Stopwatch() as sw: ...; sw.wall_s, sw.memory."""
+
+    def __init__(self):
+        self.wall_s = 0.0
+        self.memory = PeakMemory()
+        self._t0 = 0.0
+
+    def __enter__(self):
+        self.memory.__enter__()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall_s = time.perf_counter() - self._t0
+        self.memory.__exit__(*exc)
+        return False
+
+
+def counts(record, key, polydata):
+    """Stores <key>_points / <key>_cells of polydata in record."""
+    if polydata is not None:
+        record[f'{key}_points'] = polydata.GetNumberOfPoints()
+        record[f'{key}_cells'] = polydata.GetNumberOfCells()
+
+
+class StageRecorder:
+    """
+    Per-stage performance records of one run: wall time, process CPU time (all threads,
+    so concurrent stages overlap), peak RSS growth and mesh sizes. Thread-safe.
+    """
+
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name, **fields):
+        """
+        with recorder.stage('Decimate source', input=polydata) as record: ...
+        vtkPolyData fields are stored as point/cell counts, others as is; the body can
+        add more (e.g. counts(record, 'output', result)). Failed stages get 'failed': True.
+        """
+        record = {'stage': name}
+        for key, value in fields.items():
+            if hasattr(value, 'GetNumberOfPoints'):
+                counts(record, key, value)
+            else:
+                record[key] = value
+        cpu0 = time.process_time()
+        try:
+            with Stopwatch() as sw:
+                yield record
+        except BaseException:
+            record['failed'] = True
+            raise
+        finally:
+            record['wall_s'] = round(sw.wall_s, 4)
+            record['cpu_s'] = round(time.process_time() - cpu0, 4)
+            record['rss_delta_mb'] = round(sw.memory.delta / 2 ** 20, 1)
+            with self._lock:
+                self.records.append(record)
+
+    def total_wall_s(self):
+        with self._lock:
+            return round(sum(r['wall_s'] for r in self.records), 4)
+
+    def write_jsonl(self, path, **context):
+        """Appends one JSON line {timestamp, **context, stages} to path."""
+        with self._lock:
+            line = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')}
+            line.update(context)
+            line['stages'] = list(self.records)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(line, default=str) + '\n')
+
+
+def stage(recorder, name, **fields):
+    """recorder.stage(name, **fields), or a no-op context yielding a scratch dict if recorder is None."""
+    if recorder is None:
+        return contextlib.nullcontext({})
+    return recorder.stage(name, **fields)
@@ -0,0 +1,510 @@
+"""
+距離マップ計算パイプライン（デシメーション → 切り出し → 距離計算 → 最小距離）。
+Slicer の Logic とバッチ処理の両方から使用します。
+"""
+import logging
+import os
+
+from . import cropping, distance, distance_field, perf, signed_distance
+
+DISTANCE_BACKENDS = ('filter', 'locator', 'multires', 'field')
+
+# Proxy reduction for the 'multires' backend when decimation is not enabled
+DEFAULT_PROXY_REDUCTION = 0.9
+
+
+def decimate(polydata, reduction, progress=None, part=0, parts=1):
+    """Runs vtkQuadricDecimation with the given target reduction (0..1)."""
+    import vtk
+
+    decimate = vtk.vtkQuadricDecimation()
+    decimate.SetInputData(polydata)
+    decimate.SetTargetReduction(reduction)
+    if progress is not None:
+        progress.observe(decimate, part, parts)
+    decimate.Update()
+    if progress is not None:
+        progress.check()
+    return decimate.GetOutput()
+
+
+def filter_distance(source_polydata, target_polydata, progress=None):
+    """Unsigned distance with vtkDistancePolyDataFilter (exact everywhere)."""
+    import vtk
+
+    distFilter = vtk.vtkDistancePolyDataFilter()
+    distFilter.SetInputData(0, source_polydata)
+    distFilter.SetInputData(1, target_polydata)
+    distFilter.SignedDistanceOff()  # unsigned distance
+    distFilter.ComputeSecondDistanceOff()  # target->source output is never used
+    if progress is not None:
+        progress.observe(distFilter)
+    distFilter.Update()
+    if progress is not None:
+        progress.check()
+    return distFilter.GetOutput()
+
+
+def min_distance(polydata, name=distance.DISTANCE_ARRAY_NAME):
+    """Minimum of the distance point array, or None if it is missing/empty."""
+    from vtk.util.numpy_support import vtk_to_numpy
+
+    arr = polydata.GetPointData().GetArray(name)
+    if arr is None or arr.GetNumberOfTuples() == 0:
+        return None
+    return float(vtk_to_numpy(arr).min())
+
+
+def _decimated(polydata, reduction, cache, label, progress=None, part=0, parts=1, recorder=None):
+    logging.info(f"Applying decimation to {label} model (target reduction: {reduction:.2f})...")
+    built = []
+
+    def build():
+        built.append(True)
+        return decimate(polydata, reduction, progress, part, parts)
+
+    with perf.stage(recorder, f"Decimate {label}", input=polydata, reduction=reduction) as record:
+        if cache is None:
+            result, key = build(), None
+        else:
+            key = f"{cache.key(polydata)}/decimate-{reduction:.4f}"
+            result = cache.get_or_create(key, build, persist=True)
+        record['cached'] = not built
+        perf.counts(record, 'output', result)
+    return result, key
+
+
+def _decimated_pair(source_polydata, target_polydata, reduction, cache, label='', progress=None, recorder=None):
+    """Decimates both models on two threads (concurrent only if the VTK build releases the GIL)."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        source = pool.submit(_decimated, source_polydata, reduction, cache, f"source{label}", progress, 0, 2, recorder)
+        target = pool.submit(_decimated, target_polydata, reduction, cache, f"target{label}", progress, 1, 2, recorder)
+        return source.result(), target.result()
+
+
+def transform_polydata(polydata, matrix):
+    """Shallow copy of polydata with its points mapped by a 4x4 matrix (point arrays kept as they are)."""
+    import numpy as np
+    import vtk
+    from vtk.util.numpy_support import numpy_to_vtk
+
+    m = np.asarray(matrix, dtype=np.float64)
+    moved = distance.polydata_points(polydata) @ m[:3, :3].T + m[:3, 3]
+    points = vtk.vtkPoints()
+    points.SetData(numpy_to_vtk(np.ascontiguousarray(moved), deep=1))
+    result = vtk.vtkPolyData()
+    result.ShallowCopy(polydata)
+    result.SetPoints(points)
+    return result
+
+
+def _target_locator(polydata, cache, key=None):
+    if cache is None:
+        return distance.build_target_locator(polydata)
+    key = f"{key or cache.key(polydata)}/locator"
+    return cache.get_or_create(key, lambda: distance.build_target_locator(polydata))
+
+
+def _target_normals(polydata, locator, cache, key=None, orientation=None):
+    if cache is None:
+        return signed_distance.PseudoNormals.from_locator(locator, orientation)
+    key = f"{key or cache.key(polydata)}/pseudonormals" + ("" if orientation is None else f"-{orientation}")
+    return cache.get_or_create(key, lambda: signed_distance.PseudoNormals.from_locator(locator, orientation))
+
+
+def _surface_orientation(polydata, cache, key=None):
+    if cache is None:
+        return signed_distance.surface_orientation(polydata)
+    key = f"{key or cache.key(polydata)}/orientation"
+    return cache.get_or_create(key, lambda: signed_distance.surface_orientation(polydata))
+
+
+def _distance_field(polydata, spacing, band, cache, key=None, num_workers=1, progress=None):
+    """Distance field of the target, reused from memory or cache_dir when possible."""
+    from . import cache as cache_module
+
+    target_hash = cache.key(polydata) if cache is not None else cache_module.geometry_hash(polydata)
+    field_key = f"{key or target_hash}/field-{spacing:.4f}-{band:.4f}"
+    path = cache.disk_path(field_key, '') if cache is not None else None
+
+    def build():
+        if path and os.path.isfile(path + '.npy'):
+            try:
+                field = distance_field.DistanceField.load(path)
+                if field.target_hash == target_hash:
+                    return field
+            except Exception as e:
+                logging.warning(f"Ignoring unreadable distance field {path}: {e}")
+        locator = _target_locator(polydata, cache, key)
+        field = distance_field.build_distance_field(polydata, spacing, band, locator, num_workers, progress)
+        field.target_hash = target_hash
+        field.error = distance_field.error_report(field, distance_field.band_samples(polydata, band), locator)
+        logging.info(f"Distance field error vs exact (within {band} mm): max {field.error['max']:.3f} mm, "
+                     f"mean {field.error['mean']:.3f} mm, p95 {field.error['p95']:.3f} mm")
+        if path:
+            try:
+                os.makedirs(cache.cache_dir, exist_ok=True)
+                field.save(path)
+            except Exception as e:
+                logging.warning(f"Failed to persist distance field {field_key}: {e}")
+        return field
+
+    return build() if cache is None else cache.get_or_create(field_key, build)
+
+
+def _edge_length(polydata):
+    """Mean length of the first edge of each polygon (rough mesh resolution)."""
+    import numpy as np
+    from . import mesh_arrays
+
+    offsets, conn = mesh_arrays.polygons(polydata)
+    offsets = offsets[:-1]
+    if len(offsets) == 0:
+        return 0.0
+    points = mesh_arrays.points(polydata)
+    a = points[conn[offsets]]
+    b = points[conn[offsets + 1]]
+    return float(np.linalg.norm(a - b, axis=1).mean())
+
+
+def _neighbourhood_min(proxy_points, proxy_distances, points, spacing):
+    """
+    For each point, min proxy distance over proxy vertices in the 3x3x3 voxel
+    neighbourhood (inf if none). Any such proxy vertex lies within 2*sqrt(3)*spacing.
+    """
+    import numpy as np
+
+    origin = np.minimum(proxy_points.min(axis=0), points.min(axis=0)) - spacing
+    upper = np.maximum(proxy_points.max(axis=0), points.max(axis=0))
+    dims = np.floor((upper - origin) / spacing).astype(np.int64) + 2
+    grid = np.full(tuple(dims), np.inf)
+    idx = np.floor((proxy_points - origin) / spacing).astype(np.int64)
+    np.minimum.at(grid, (idx[:, 0], idx[:, 1], idx[:, 2]), proxy_distances)
+    # Separable 3x3x3 min filter
+    for axis in range(3):
+        g = np.moveaxis(grid, axis, 0)
+        out = g.copy()
+        np.minimum(out[1:], g[:-1], out=out[1:])
+        np.minimum(out[:-1], g[1:], out=out[:-1])
+        grid = np.moveaxis(out, 0, axis)
+    pidx = np.floor((points - origin) / spacing).astype(np.int64)
+    return grid[pidx[:, 0], pidx[:, 1], pidx[:, 2]]
+
+
+def multires_distance(source_polydata, target_polydata, threshold=distance.DEFAULT_MAX_DISTANCE,
+                      proxy_reduction=DEFAULT_PROXY_REDUCTION, num_workers=1, cache=None, progress=None):
+    """
+    Coarse-to-fine distance on the full-resolution source vertices.
+    Distances on decimated proxies select which vertices can be closer than threshold;
+    only those are searched exactly on the original target. All others get threshold,
+    like the cutoff of the other backends. The selection allows for the proxy error measured at
+    sample points (a sampled estimate, not a strict bound), and vertices without a proxy
+    vertex nearby are always refined. The proxy decimation and error check usually cost more
+    than the bounded 'locator' search saves, which the module's UI uses instead.
+    """
+    import numpy as np
+
+    threshold = float(threshold)
+    points = distance.polydata_points(source_polydata)
+    target_points = distance.polydata_points(target_polydata)
+
+    # 1. Coarse: proxy source vertices -> proxy target
+    if progress is not None:
+        progress.substage('Decimating proxies', 0.0, 0.4)
+    (proxy_source, _), (proxy_target, proxy_key) = _decimated_pair(
+        source_polydata, target_polydata, proxy_reduction, cache, ' proxy', progress)
+    if progress is not None:
+        progress.substage('Coarse distances', 0.4, 0.55)
+    proxy_locator = _target_locator(proxy_target, cache, proxy_key)
+    full_locator = _target_locator(target_polydata, cache)
+    proxy_points = distance.polydata_points(proxy_source)
+
+    # Proxy approximation error: sampled Hausdorff estimate in both directions, using the
+    # proxy's triangle centroids as well as its vertices (the largest deviations of a
+    # decimated surface are inside its big flat triangles)
+    def proxy_error():
+        from . import mesh_arrays
+
+        rng = np.random.default_rng(0)
+        sample = target_points
+        if len(sample) > 20000:
+            sample = sample[rng.choice(len(sample), 20000, replace=False)]
+        proxy_vertices = distance.polydata_points(proxy_target)
+        proxy_faces = np.asarray(mesh_arrays.triangles(distance.triangulate(proxy_target)), dtype=np.int64)
+        proxy_sample = np.concatenate((proxy_vertices, proxy_vertices[proxy_faces].mean(axis=1)))
+        return max(
+            float(distance.closest_distances(sample, proxy_locator).max()),
+            float(distance.closest_distances(proxy_sample, full_locator).max()),
+        )
+    eps = proxy_error() if cache is None else cache.get_or_create(f"{proxy_key}/error", proxy_error)
+
+    extent = float((points.max(axis=0) - points.min(axis=0)).max())
+    spacing = max(threshold / 4.0, _edge_length(proxy_source), extent / 256.0, 1e-6)
+    slack = 2.0 * np.sqrt(3.0) * spacing + eps
+    proxy_distances = distance.parallel_closest_distances(
+        proxy_points, proxy_locator, threshold + slack, num_workers, progress=progress)
+
+    # 2. Lower bound per full-resolution vertex; candidates may be closer than threshold.
+    # Vertices with no proxy vertex in their neighbourhood (inf: large proxy triangles in
+    # flat areas) have no estimate and are refined too.
+    estimate = _neighbourhood_min(proxy_points, proxy_distances, points, spacing)
+    candidates = np.flatnonzero(~np.isfinite(estimate) | (estimate - slack < threshold))
+    logging.info(f"Multi-resolution: {len(candidates)}/{len(points)} vertices refined "
+                 f"(spacing {spacing:.2f} mm, proxy error {eps:.3f} mm)")
+
+    # 3. Fine: exact (below threshold) on the original meshes for candidates only
+    if progress is not None:
+        progress.substage('Refining contact region', 0.55, 1.0)
+    result = np.full(len(points), threshold)
+    if len(candidates):
+        exact = distance.parallel_closest_distances(points[candidates], full_locator, threshold, num_workers,
+                                                    progress=progress)
+        result[candidates] = np.where(exact < threshold, exact, result[candidates])
+    return distance.attach_distances(source_polydata, result)
+
+
+def _backend_distance(source_polydata, target_polydata, distance_backend, max_distance,
+                      num_workers, cache, target_key, proxy_reduction, field_spacing, progress=None, signed=False,
+                      roi=None, whole=None, record=None):
+    if signed:
+        # The sign comes from the closest points of the locator search, so every backend
+        # shares it; the bounded search keeps the cost of an unsigned 'locator' run
+        cutoff = None if max_distance is None else float(max_distance)
+        if distance_backend != 'locator':
+            logging.info(f"Signed distance uses the cell locator search instead of the {distance_backend} backend.")
+        logging.info(f"Calculating signed distances with cell locator (cutoff: {cutoff} mm, workers: {num_workers})...")
+        locator = _target_locator(target_polydata, cache, target_key)
+        if whole is None:
+            normals = _target_normals(target_polydata, locator, cache, target_key)
+            return signed_distance.signed_locator_distance(source_polydata, target_polydata, cutoff, num_workers,
+                                                           locator=locator, normals=normals, progress=progress)
+        # A cropped (open) target: orientation and the inside test come from the whole surface
+        whole_polydata, whole_key = whole
+        orientation = _surface_orientation(whole_polydata, cache, whole_key)
+        normals = _target_normals(target_polydata, locator, cache, target_key, orientation)
+        return signed_distance.signed_locator_distance(source_polydata, target_polydata, cutoff, num_workers,
+                                                       locator=locator, normals=normals, progress=progress,
+                                                       surface=whole_polydata)
+
+    if distance_backend == 'field':
+        band = distance.DEFAULT_MAX_DISTANCE if max_distance is None else float(max_distance)
+        logging.info(f"Calculating distances from the target distance field (spacing: {field_spacing} mm, band: {band} mm)...")
+        field = _distance_field(target_polydata, field_spacing, band, cache, target_key, num_workers, progress)
+        if record is not None and 'max' in field.error:
+            # Interpolation error vs exact distances, measured when the field was baked
+            record['field_error'] = dict(field.error)
+        points = distance.polydata_points(source_polydata)
+        if roi is None:
+            return distance.attach_distances(source_polydata, field.sample(points))
+        # Only the source points inside the ROI are looked up; the rest get the band value
+        import numpy as np
+
+        values = np.full(len(points), band)
+        inside = cropping.points_in_roi(points, roi)
+        values[inside] = field.sample(points[inside])
+        return distance.attach_distances(source_polydata, values)
+
+    if distance_backend == 'multires':
+        threshold = distance.DEFAULT_MAX_DISTANCE if max_distance is None else float(max_distance)
+        logging.info(f"Calculating distances coarse-to-fine (threshold: {threshold} mm, proxy reduction: {proxy_reduction:.2f})...")
+        return multires_distance(source_polydata, target_polydata, threshold, proxy_reduction, num_workers, cache,
+                                 progress)
+
+    if distance_backend == 'locator':
+        cutoff = None if max_distance is None else float(max_distance)
+        logging.info(f"Calculating distances with cell locator (cutoff: {cutoff} mm, workers: {num_workers})...")
+        locator = _target_locator(target_polydata, cache, target_key)
+        return distance.locator_distance(source_polydata, target_polydata, cutoff, num_workers, locator=locator,
+                                         progress=progress)
+
+    # VTK filter (robust and memory-friendly)
+    logging.info("Calculating distances with vtkDistancePolyDataFilter...")
+    return filter_distance(source_polydata, target_polydata, progress)
+
+
+def symmetric_summary(source_result, target_result, name=distance.DISTANCE_ARRAY_NAME):
+    """
+    Hausdorff-style summary of a bidirectional run: 'min' (closest approach), 'source_max'
+    / 'target_max' (largest distance from each surface), 'hausdorff' (the larger of the two)
+    and 'mean' (mean over the vertices of both surfaces). Values beyond a cutoff are
+    saturated at the cutoff. None if either distance array is missing/empty.
+    """
+    from vtk.util.numpy_support import vtk_to_numpy
+
+    values = []
+    for polydata in (source_result, target_result):
+        arr = polydata.GetPointData().GetArray(name)
+        if arr is None or arr.GetNumberOfTuples() == 0:
+            return None
+        values.append(vtk_to_numpy(arr))
+    source_values, target_values = values
+    source_max, target_max = float(source_values.max()), float(target_values.max())
+    return {
+        'min': float(min(source_values.min(), target_values.min())),
+        'source_max': source_max,
+        'target_max': target_max,
+        'hausdorff': max(source_max, target_max),
+        'mean': float((source_values.sum() + target_values.sum()) / (len(source_values) + len(target_values))),
+    }
+
+
+def _run_directions(directions, distance_backend, max_distance, num_workers, cache, proxy_reduction,
+                    field_spacing, progress=None, recorder=None, signed=False):
+    """
+    Runs _backend_distance for each (source, target, target cache key, label[, roi[, whole]]), where
+    whole is the (polydata, cache key) of the uncropped target; with two directions they run
+    concurrently and split num_workers between them.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    parts = len(directions)
+    workers = max(1, num_workers // parts)
+
+    def run(index, source, target, target_key, label, roi=None, whole=None):
+        part = progress if parts == 1 or progress is None else progress.part(index, parts)
+        kind = 'signed' if signed else distance_backend
+        name = f"Distance ({kind})" if parts == 1 else f"Distance ({kind}, {label})"
+        with perf.stage(recorder, name, source=source, target=target, workers=workers) as record:
+            result = _backend_distance(source, target, distance_backend, max_distance, workers, cache, target_key,
+                                       proxy_reduction, field_spacing, part, signed, roi, whole, record)
+            perf.counts(record, 'output', result)
+        return result
+
+    if parts == 1:
+        return [run(0, *directions[0])]
+    with ThreadPoolExecutor(max_workers=parts) as pool:
+        futures = [pool.submit(run, index, *direction) for index, direction in enumerate(directions)]
+        return [f.result() for f in futures]
+
+
+def compute_distance_map(source_polydata, target_polydata, enable_decimation=False, decimation_value=0.0,
+                         distance_backend='filter', max_distance=None, num_workers=1, cache=None,
+                         crop=False, roi=None, field_spacing=distance_field.DEFAULT_SPACING, progress=None,
+                         recorder=None, bidirectional=False, signed=False, source_matrix=None):
+    """
+    Returns the (optionally decimated) source polydata with a "Distance" point array.
+    distance_backend: 'filter' (vtkDistancePolyDataFilter, exact everywhere),
+    'locator' (cell locator search; with max_distance, farther points get max_distance) or
+    'multires' (exact below max_distance on the full-resolution source; decimation
+    settings define the coarse proxies instead of the output mesh) or
+    'field' (trilinear lookup in a narrow-band distance field of the target, baked once
+    at field_spacing mm out to max_distance and cached; approximate, see the logged error)
+    num_workers: worker processes for the locator search ('locator'/'multires' backends;
+    see distance.parallel_closest_distances)
+    cache: optional cache.PreprocessingCache reused across calls (decimated meshes, locators)
+    crop: compute only where the models' bounds grown by the cutoff (max_distance,
+    default 5 mm) overlap; all other source points get the cutoff value
+    roi: optional (to_roi 4x4, half_size) box further limiting the source points (implies crop;
+    with the 'field' backend, which does not crop, only the source points inside it are looked up)
+    field_spacing: grid spacing (mm) of the 'field' backend
+    progress: optional progress.ProgressReporter (stage progress, cancellation -> progress.Cancelled)
+    recorder: optional perf.StageRecorder collecting per-stage timing and memory
+    bidirectional: also map the target by its distance to the source and return
+    (source result, target result); decimation and cropping are shared, and the two
+    directions run concurrently with num_workers split between them
+    signed: negative distances for points inside the other surface (penetration), signed
+    from the closest points of the cell locator search (any backend); beyond max_distance
+    the value is +max_distance, or -max_distance inside a closed target
+    source_matrix: optional rigid 4x4 matrix from source into target coordinates (e.g. the
+    models' parent transforms); distances are computed in the target's coordinates and the
+    source result keeps the source's own, while roi is expected in target coordinates
+    """
+    import numpy as np
+
+    if distance_backend not in DISTANCE_BACKENDS:
+        raise ValueError(f"Unknown distance backend: {distance_backend}")
+    if bidirectional and cache is None:
+        # Lets both directions share geometry hashes and decimated proxies
+        from .cache import PreprocessingCache
+        cache = PreprocessingCache()
+
+    # Apply decimation if enabled ('multires' decimates proxies only)
+    source_key = target_key = None
+    proxy_reduction = DEFAULT_PROXY_REDUCTION
+    distance_start = 0.0
+    if enable_decimation and decimation_value > 0.0:
+        if distance_backend == 'multires':
+            proxy_reduction = decimation_value
+        else:
+            if progress is not None:
+                progress.stage('Decimating', 0.0, 0.3)
+            (source_polydata, source_key), (target_polydata, target_key) = _decimated_pair(
+                source_polydata, target_polydata, decimation_value, cache, progress=progress, recorder=recorder)
+            distance_start = 0.3
+
+    original_source = None
+    if source_matrix is not None and not np.allclose(source_matrix, np.eye(4)):
+        # Computed on a moved copy (which no longer matches the source's cache key); the
+        # distances go back onto the source's own points (decimated proxies stay cached)
+        original_source = source_polydata
+        source_polydata, source_key = transform_polydata(source_polydata, source_matrix), None
+
+    def finish(results):
+        if original_source is not None:
+            from vtk.util.numpy_support import vtk_to_numpy
+            values = vtk_to_numpy(results[0].GetPointData().GetArray(distance.DISTANCE_ARRAY_NAME))
+            results[0] = distance.attach_distances(original_source, values)
+        return tuple(results) if bidirectional else results[0]
+
+    logging.info(f"Source points/cells: {source_polydata.GetNumberOfPoints()}/{source_polydata.GetNumberOfCells()}, "
+                 f"Target points/cells: {target_polydata.GetNumberOfPoints()}/{target_polydata.GetNumberOfCells()}")
+
+    field_roi = None
+    if distance_backend == 'field' and (crop or roi is not None) and not signed:
+        # Lookups are O(1) already, and a cropped target would need its own field;
+        # an ROI still limits which source points are looked up
+        logging.info("Cropping is not used with the distance field backend"
+                     + (" (the ROI limits the source lookups)." if roi is not None else "."))
+        field_roi, crop, roi = roi, False, None
+
+    options = (distance_backend, max_distance, num_workers, cache, proxy_reduction, field_spacing)
+    if not crop and roi is None:
+        if progress is not None:
+            progress.stage('Computing distances', distance_start, 1.0)
+        directions = [(source_polydata, target_polydata, target_key, 'source', field_roi)]
+        if bidirectional:
+            directions.append((target_polydata, source_polydata, source_key, 'target'))
+        results = _run_directions(directions, *options, progress=progress, recorder=recorder, signed=signed)
+        return finish(results)
+
+    # Crop to the joint region, compute there, and saturate everything else
+    cutoff = distance.DEFAULT_MAX_DISTANCE if max_distance is None else float(max_distance)
+    logging.info(f"Cropping to the joint region (cutoff: {cutoff} mm)...")
+    if progress is not None:
+        progress.stage('Cropping', distance_start, distance_start + 0.05)
+    with perf.stage(recorder, "Crop", source=source_polydata, target=target_polydata) as record:
+        cropped_source, point_ids, cropped_target, target_ids = cropping.crop_both(
+            source_polydata, target_polydata, cutoff, roi)
+        perf.counts(record, 'output_source', cropped_source)
+        perf.counts(record, 'output_target', cropped_target)
+    outputs = [(source_polydata, point_ids)]
+    if bidirectional:
+        outputs.append((target_polydata, target_ids))
+    values = [np.full(polydata.GetNumberOfPoints(), cutoff) for polydata, _ in outputs]
+    if cropped_source is not None:
+        if progress is not None:
+            progress.stage('Computing distances', distance_start + 0.05, 1.0)
+        directions = [(cropped_source, cropped_target, None, 'source', None, (target_polydata, target_key)),
+                      (cropped_target, cropped_source, None, 'target', None, (source_polydata, source_key))]
+        directions = directions[:len(outputs)]
+        results = _run_directions(directions, distance_backend, cutoff, *options[2:], progress=progress,
+                                  recorder=recorder, signed=signed)
+        from vtk.util.numpy_support import vtk_to_numpy
+        for out, (_, ids), result in zip(values, outputs, results):
+            cropped_values = vtk_to_numpy(result.GetPointData().GetArray(distance.DISTANCE_ARRAY_NAME))
+            out[ids] = np.minimum(cropped_values, cutoff)
+    if signed:
+        # Points outside the crop can still lie deeper than the cutoff inside the other model
+        for out, (polydata, ids), (other, other_key) in zip(values, outputs, ((target_polydata, target_key),
+                                                                                (source_polydata, source_key))):
+            points = distance.polydata_points(polydata)
+            rest = np.ones(len(points), dtype=bool)
+            rest[ids] = False
+            if roi is not None:
+                rest &= cropping.points_in_roi(points, roi)
+            if rest.any() and _surface_orientation(other, cache, other_key)[0]:
+                signed_distance.negate_enclosed(points, out, np.flatnonzero(rest), other)
+    results = [distance.attach_distances(polydata, v) for (polydata, _), v in zip(outputs, values)]
+    return finish(results)
@@ -0,0 +1,114 @@
+"""
+処理の進捗通知とキャンセル（スレッドセーフ、VTK の ProgressEvent と連携）。
+"""
+import threading
+
+
+class Cancelled(Exception):
+    """Raised inside the pipeline when the user cancelled processing."""
+
+
+class ProgressReporter:
+    """
+    Maps per-stage progress (0..1) onto an overall range and forwards it to
+    callback(stage_name, overall_fraction). cancel_event (threading.Event) aborts
+    running VTK filters and makes check() raise Cancelled.
+    The callback is called from worker threads; it must not touch Qt/MRML directly.
+    """
+
+    def __init__(self, callback=None, cancel_event=None):
+        self.callback = callback
+        self.cancel_event = cancel_event or threading.Event()
+        self._lock = threading.Lock()
+        self._name = ''
+        self._start = 0.0
+        self._end = 1.0
+        self._stage_range = (0.0, 1.0)
+        self._parts = {}
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def check(self):
+        if self.cancel_event.is_set():
+            raise Cancelled()
+
+    def stage(self, name, start, end):
+        """Starts a stage occupying [start, end] of the overall progress."""
+        with self._lock:
+            self._name, self._start, self._end = name, float(start), float(end)
+            self._stage_range = (self._start, self._end)
+            self._parts = {}
+        self.update(0.0)
+
+    def substage(self, name, start, end):
+        """Starts a step occupying [start, end] (0..1) of the current stage."""
+        with self._lock:
+            lo, hi = self._stage_range
+            self._name = name
+            self._start, self._end = lo + float(start) * (hi - lo), lo + float(end) * (hi - lo)
+            self._parts = {}
+        self.update(0.0)
+
+    def update(self, fraction):
+        self.check()
+        if self.callback is None:
+            return
+        with self._lock:
+            name = self._name
+            value = self._start + max(0.0, min(1.0, float(fraction))) * (self._end - self._start)
+        self.callback(name, value)
+
+    def observe(self, algorithm, part=0, parts=1):
+        """
+        Forwards the VTK algorithm's ProgressEvent to the current stage and aborts the
+        algorithm once cancelled. Algorithms running concurrently in one stage pass
+        distinct part indices; the stage progress is their mean.
+        Call check() after Update() to turn an abort into Cancelled.
+        """
+        import vtk
+
+        def onProgress(caller, event):
+            if self.cancel_event.is_set():
+                caller.SetAbortExecute(1)
+                return
+            if self.callback is not None:
+                with self._lock:
+                    self._parts[part] = caller.GetProgress()
+                    fraction = sum(self._parts.values()) / parts
+                try:
+                    self.update(fraction)
+                except Cancelled:
+                    caller.SetAbortExecute(1)
+
+        return algorithm.AddObserver(vtk.vtkCommand.ProgressEvent, onProgress)
+
+    def part(self, index, parts):
+        """
+        Reporter for one of several concurrent parts of the current stage (see PartProgress).
+        """
+        return PartProgress(self, index, parts)
+
+    def _update_part(self, index, parts, fraction):
+        with self._lock:
+            self._parts[index] = fraction
+            fraction = sum(self._parts.values()) / parts
+        self.update(fraction)
+
+
+class PartProgress(ProgressReporter):
+    """
+    Progress of one of several parts running concurrently within a stage of parent.
+    Its own stages and substages divide the part's 0..1; the parent stage shows the
+    mean over all parts. Shares the parent's cancel event.
+    """
+
+    def __init__(self, parent, index, parts):
+        ProgressReporter.__init__(self, self._forward, parent.cancel_event)
+        self.parent = parent
+        self.index = index
+        self.parts = parts
+
+    def _forward(self, stage, value):
+        self.parent._update_part(self.index, self.parts, value)
@@ -0,0 +1,125 @@
+"""
+距離のみのコンパクトな結果ファイル（.npz）。
+float32 の距離配列・Source メッシュの形状ハッシュ・実行パラメータだけを保存し、
+読み込み時は形状をコピーせずに Source モデルへ再接続します（VTK / NumPy のみ使用）。
+"""
+import json
+import os
+
+from . import distance
+
+RESULT_EXTENSION = '.npz'
+FORMAT_VERSION = 1
+
+
+def distance_arrays(polydata):
+    """
+    Distances of a result polydata as float32: (frames, N) if it holds per-frame arrays
+    (Distance_0000, ... from a motion sequence), else (N,) from the "Distance" array.
+    """
+    import numpy as np
+    from vtk.util.numpy_support import vtk_to_numpy
+    from .sequence import FRAME_ARRAY_FORMAT
+
+    point_data = polydata.GetPointData()
+    frames = []
+    while point_data.GetArray(FRAME_ARRAY_FORMAT.format(len(frames))) is not None:
+        frames.append(vtk_to_numpy(point_data.GetArray(FRAME_ARRAY_FORMAT.format(len(frames)))))
+    if frames:
+        return np.asarray(frames, dtype=np.float32)
+    arr = point_data.GetArray(distance.DISTANCE_ARRAY_NAME)
+    if arr is None or arr.GetNumberOfTuples() == 0:
+        raise ValueError(f"Result has no {distance.DISTANCE_ARRAY_NAME} array")
+    return np.asarray(vtk_to_numpy(arr), dtype=np.float32)
+
+
+def save_distances(path, distances, source_hash, params=None):
+    """
+    Writes distances ((N,) or (frames, N), stored as float32), the geometry hash of the
+    mesh they belong to and the run parameters (JSON-serialisable) to a compressed .npz.
+    """
+    import numpy as np
+
+    meta = {'version': FORMAT_VERSION, 'source_hash': source_hash, 'params': params or {}}
+    tmp_path = path + '.part.npz'
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f, distance=np.ascontiguousarray(distances, dtype=np.float32),
+                            meta=np.array(json.dumps(meta, default=str)))
+    os.replace(tmp_path, path)
+
+
+def load_distances(path):
+    """Reads a file written by save_distances; returns (distances float32, meta dict)."""
+    import numpy as np
+
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data['meta']))
+        distances = data['distance']
+    if meta.get('version', 0) > FORMAT_VERSION:
+        raise ValueError(f"{path} was written by a newer version (format {meta['version']})")
+    return distances, meta
+
+
+def save_result(path, result_polydata, params=None, source_hash=None):
+    """
+    Compact save of a result polydata (see distance_arrays). source_hash defaults to the
+    geometry hash of result_polydata, which equals that of the source model unless the
+    result was decimated.
+    """
+    from . import cache
+
+    if source_hash is None:
+        source_hash = cache.geometry_hash(result_polydata)
+    save_distances(path, distance_arrays(result_polydata), source_hash, params)
+
+
+def attach_distance_arrays(source_polydata, distances):
+    """
+    Shallow copy of source_polydata (points and cells shared, not copied) carrying
+    distances as the active "Distance" array, plus Distance_NNNN arrays for (frames, N)
+    input with frame 0 active. The NumPy buffers are shared with the VTK arrays.
+    """
+    import numpy as np
+    import vtk
+    from vtk.util.numpy_support import numpy_to_vtk
+    from .sequence import FRAME_ARRAY_FORMAT
+
+    distances = np.asarray(distances, dtype=np.float32)
+    frames = distances if distances.ndim == 2 else distances[None, :]
+    if frames.shape[1] != source_polydata.GetNumberOfPoints():
+        raise ValueError(f"Distances have {frames.shape[1]} values, the model has "
+                         f"{source_polydata.GetNumberOfPoints()} points")
+
+    result = vtk.vtkPolyData()
+    result.ShallowCopy(source_polydata)
+    point_data = result.GetPointData()
+
+    def add(values, name):
+        arr = numpy_to_vtk(np.ascontiguousarray(values), deep=0)
+        arr.SetName(name)
+        point_data.RemoveArray(name)
+        point_data.AddArray(arr)
+
+    if distances.ndim == 2:
+        for k, values in enumerate(frames):
+            add(values, FRAME_ARRAY_FORMAT.format(k))
+    add(frames[0].copy() if distances.ndim == 2 else frames[0], distance.DISTANCE_ARRAY_NAME)
+    point_data.SetActiveScalars(distance.DISTANCE_ARRAY_NAME)
+    return result
+
+
+def attach_result(source_polydata, path, source_hash=None, verify=True):
+    """
+    Loads a compact result and attaches it to source_polydata (see attach_distance_arrays).
+    With verify, the stored geometry hash must match the source (source_hash if given,
+    else computed). Returns (polydata, meta).
+    """
+    from . import cache
+
+    distances, meta = load_distances(path)
+    if verify:
+        if source_hash is None:
+            source_hash = cache.geometry_hash(source_polydata)
+        if meta.get('source_hash') != source_hash:
+            raise ValueError(f"{os.path.basename(path)} was computed on a different mesh than this model")
+    return attach_distance_arrays(source_polydata, distances), meta
@@ -0,0 +1,165 @@
+"""
+剛体変換の時系列（顎運動）に対する距離計算（VTK / NumPy のみ使用）。
+ターゲットの探索構造は 1 回だけ構築し、各フレームの変換後の Source 点を流し込みます。
+"""
+import logging
+import time
+
+from . import distance, pipeline
+from .contact import DEFAULT_CONTACT_THRESHOLDS, vertex_areas
+
+FRAME_ARRAY_FORMAT = distance.DISTANCE_ARRAY_NAME + "_{:04d}"
+
+# Points searched per update while a live preview is being dragged
+PREVIEW_POINTS = 20000
+
+
+def transform_points(points, matrix):
+    """Applies a 4x4 homogeneous matrix to (N, 3) points."""
+    import numpy as np
+
+    m = np.asarray(matrix, dtype=np.float64)
+    return points @ m[:3, :3].T + m[:3, 3]
+
+
+class RigidMotionDistance:
+    """
+    Distances from rigidly moving points to a fixed target, capped at cutoff.
+    Every point keeps a lower bound on its distance which shrinks by the point's
+    displacement between updates (and never drops below the distance to the target
+    bounds); only points whose bound falls below the cutoff are searched again.
+    """
+
+    def __init__(self, points, locator, target_bounds, cutoff=distance.DEFAULT_MAX_DISTANCE, num_workers=1):
+        import numpy as np
+
+        self.points = points
+        self.locator = locator
+        self.bounds = np.asarray(target_bounds, dtype=np.float64).reshape((3, 2))
+        self.cutoff = float(cutoff)
+        # Searching beyond the cutoff leaves slack so far points survive several updates
+        self.radius = 2.0 * self.cutoff
+        self.num_workers = num_workers
+        self.lower = np.zeros(len(points))  # lower bound on the current distance (0 = unknown)
+        self.exact = np.full(len(points), self.radius)
+        self.previous = None
+        self.pending = len(points)  # points that may be inside the cutoff but were not searched
+        self.queries = 0
+
+    def update(self, matrix, subset=None):
+        """
+        Moves the points by the 4x4 matrix (into target coordinates) and returns their
+        distances. subset (index array) limits the search to those points; the others
+        keep their last value until an update without subset.
+        """
+        import numpy as np
+
+        moved = transform_points(self.points, matrix)
+        if self.previous is not None:
+            self.lower -= np.linalg.norm(moved - self.previous, axis=1)
+        self.previous = moved
+        # Distance to the target bounding box is a free lower bound as well
+        outside = np.maximum(self.bounds[:, 0] - moved, 0.0) + np.maximum(moved - self.bounds[:, 1], 0.0)
+        np.maximum(self.lower, np.linalg.norm(outside, axis=1), out=self.lower)
+
+        stale = self.lower < self.cutoff
+        search = stale
+        if subset is not None:
+            search = np.zeros(len(self.points), dtype=bool)
+            search[subset] = stale[subset]
+        ids = np.flatnonzero(search)
+        if len(ids):
+            d = distance.parallel_closest_distances(moved[ids], self.locator, self.radius, self.num_workers)
+            self.exact[ids] = d
+            self.lower[ids] = d
+        self.queries = len(ids)
+        self.pending = int(np.count_nonzero(stale)) - len(ids)
+
+        result = np.where(self.lower < self.cutoff, self.exact, self.cutoff)
+        np.minimum(result, self.cutoff, out=result)
+        return result
+
+
+def preview_subset(n_points, count=PREVIEW_POINTS):
+    """Evenly strided point ids (at most about count) for interactive updates."""
+    import numpy as np
+
+    return np.arange(0, n_points, max(1, -(-n_points // max(1, count))))
+
+
+def sequence_distances(source_polydata, target_polydata, matrices, max_distance=distance.DEFAULT_MAX_DISTANCE,
+                       contact_thresholds=DEFAULT_CONTACT_THRESHOLDS, num_workers=1, cache=None, field_spacing=None,
+                       progress=None):
+    """
+    Distance from the source vertices, moved by each 4x4 matrix (source -> target
+    coordinates), to the target surface. Values are exact below max_distance and
+    max_distance otherwise; only points that may have come within max_distance are
+    searched again per frame (see RigidMotionDistance).
+    cache: optional cache.PreprocessingCache; the target locator is built once and reused.
+    field_spacing: if set, frames are interpolated from a distance field of the target
+    (baked once at this spacing) instead of searched; approximate, but independent of motion.
+
+    Returns a dict with 'distances' (frames x points, float32), 'min_distance' (frames,),
+    'contact_area' ({threshold: (frames,)} in mm^2) and 'queries' (points searched per frame).
+    """
+    import numpy as np
+    from . import mesh_arrays
+
+    cutoff = float(max_distance)
+    points = distance.polydata_points(source_polydata)
+    areas = vertex_areas(points, mesh_arrays.triangles(source_polydata))
+    field = tracker = None
+    if field_spacing:
+        field = pipeline._distance_field(target_polydata, float(field_spacing), cutoff, cache,
+                                         num_workers=num_workers, progress=progress)
+    else:
+        tracker = RigidMotionDistance(points, pipeline._target_locator(target_polydata, cache),
+                                      target_polydata.GetBounds(), cutoff, num_workers)
+
+    n_frames = len(matrices)
+    out = np.empty((n_frames, len(points)), dtype=np.float32)
+    min_distance = np.empty(n_frames)
+    contact_area = {float(t): np.empty(n_frames) for t in contact_thresholds}
+    queries = np.zeros(n_frames, dtype=np.int64)
+
+    t_start = time.perf_counter()
+    for k, matrix in enumerate(matrices):
+        if progress is not None:
+            progress.update(k / max(1, n_frames))
+        if field is not None:
+            frame = field.sample(transform_points(points, matrix))
+        else:
+            frame = tracker.update(matrix)
+            queries[k] = tracker.queries
+        out[k] = frame
+        min_distance[k] = frame.min() if len(frame) else np.nan
+        for t in contact_area:
+            contact_area[t][k] = areas[frame < t].sum()
+    if progress is not None:
+        progress.update(1.0)
+
+    elapsed = time.perf_counter() - t_start
+    logging.info(f"Sequence: {n_frames} frames, {len(points)} points, "
+                 f"{queries.mean() if n_frames else 0:.0f} queries/frame, {n_frames / max(elapsed, 1e-9):.1f} frames/s")
+    return {
+        'distances': out,
+        'min_distance': min_distance,
+        'contact_area': contact_area,
+        'queries': queries,
+    }
+
+
+def attach_frames(polydata, distances, frame=0):
+    """
+    Copy of polydata with one point array per frame (Distance_0000, ...) and the
+    given frame also stored as the active "Distance" array.
+    """
+    from vtk.util.numpy_support import numpy_to_vtk
+
+    result = distance.attach_distances(polydata, distances[frame])
+    point_data = result.GetPointData()
+    for k, values in enumerate(distances):
+        arr = numpy_to_vtk(values, deep=1)
+        arr.SetName(FRAME_ARRAY_FORMAT.format(k))
+        point_data.AddArray(arr)
+    return result
@@ -0,0 +1,212 @@
+"""
+符号付き距離（VTK / NumPy のみ使用）。
+符号なし距離と同じセルロケータの最近点から、角度重み付き擬似法線で内外を判定します
+（追加の探索なし）。打ち切り距離内に面が見つからない点だけは内外判定（レイキャスト）で符号を決めます。
+負の値はターゲット内部への侵入を表します。
+"""
+import logging
+
+from . import distance
+
+# Barycentric coordinates below this count as on an edge/vertex of the triangle
+_FEATURE_TOLERANCE = 1e-6
+
+
+def _edges(faces):
+    """(edge id per face corner (M, 3), face count per edge) for edges ab, bc, ca of every face."""
+    import numpy as np
+
+    pairs = np.stack((faces, np.roll(faces, -1, axis=1)), axis=2).reshape((-1, 2))
+    pairs.sort(axis=1)
+    _, edge_ids, edge_faces = np.unique(pairs, axis=0, return_inverse=True, return_counts=True)
+    return edge_ids.reshape((-1, 3)), edge_faces
+
+
+def _orientation(points, faces, edge_faces):
+    import numpy as np
+
+    closed = bool(len(edge_faces)) and bool(np.all(edge_faces == 2))
+    if not closed:
+        return False, False
+    # A negative enclosed volume means the normals point inwards
+    a, b, c = points[faces[:, 0]], points[faces[:, 1]], points[faces[:, 2]]
+    return True, bool(np.einsum('ij,ij->', a, np.cross(b, c)) < 0.0)
+
+
+def surface_orientation(polydata):
+    """
+    (closed, flipped) of the triangulated surface of polydata: closed if every edge has two
+    faces, flipped if a closed surface's normals point inwards.
+    """
+    import numpy as np
+    from . import mesh_arrays
+
+    tri_poly = distance.triangulate(polydata)
+    points = distance.polydata_points(tri_poly)
+    faces = np.asarray(mesh_arrays.triangles(tri_poly), dtype=np.int64)
+    return _orientation(points, faces, _edges(faces)[1])
+
+
+class PseudoNormals:
+    """
+    Angle-weighted pseudo-normals of a triangle mesh (Baerentzen & Aanaes): face normals,
+    edge normals (sum of the two adjacent face normals) and vertex normals (incident face
+    normals weighted by the corner angle). For any point, the sign of
+    dot(point - closest surface point, pseudo-normal of the closest feature) tells
+    outside (+) from inside (-) on a closed, consistently oriented surface.
+    orientation: (closed, flipped) of the whole surface (see surface_orientation) when
+    points/faces are a crop of it; by default detected on points/faces themselves.
+    """
+
+    def __init__(self, points, faces, orientation=None):
+        import numpy as np
+
+        points = np.asarray(points, dtype=np.float64)
+        faces = np.asarray(faces, dtype=np.int64)
+        self.points = points
+        self.faces = faces
+        a, b, c = points[faces[:, 0]], points[faces[:, 1]], points[faces[:, 2]]
+        normals = np.cross(b - a, c - a)
+        normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-300)
+
+        self.edge_ids, edge_faces = _edges(faces)
+        # Normals must point outwards
+        self.closed, self.flipped = _orientation(points, faces, edge_faces) if orientation is None else orientation
+        if self.flipped:
+            normals = -normals
+            logging.info("Signed distance: target normals point inwards; using the reversed orientation")
+        self.face_normals = normals
+
+        repeated = np.repeat(normals, 3, axis=0)
+        n_edges = len(edge_faces)
+        self.edge_normals = np.stack(
+            [np.bincount(self.edge_ids.ravel(), weights=repeated[:, k], minlength=n_edges) for k in range(3)], axis=1)
+
+        angles = np.empty((len(faces), 3))
+        for k, (p, q, r) in enumerate(((a, b, c), (b, c, a), (c, a, b))):
+            u, v = q - p, r - p
+            angles[:, k] = np.arctan2(np.linalg.norm(np.cross(u, v), axis=1), np.einsum('ij,ij->i', u, v))
+        weights = (angles[:, :, None] * normals[:, None, :]).reshape((-1, 3))
+        self.vertex_normals = np.stack(
+            [np.bincount(faces.ravel(), weights=weights[:, k], minlength=len(points)) for k in range(3)], axis=1)
+
+    @classmethod
+    def from_locator(cls, locator, orientation=None):
+        """Pseudo-normals of the triangulated surface a locator was built on (same cell ids)."""
+        return cls(*distance.locator_faces(locator), orientation=orientation)
+
+    def normals_at(self, closest, cell_ids):
+        """Pseudo-normal (M, 3) of the feature (face, edge or vertex) each closest point lies on."""
+        import numpy as np
+
+        f = self.faces[cell_ids]
+        a, b, c = self.points[f[:, 0]], self.points[f[:, 1]], self.points[f[:, 2]]
+        v0, v1, v2 = b - a, c - a, closest - a
+        d00 = np.einsum('ij,ij->i', v0, v0)
+        d01 = np.einsum('ij,ij->i', v0, v1)
+        d11 = np.einsum('ij,ij->i', v1, v1)
+        d20 = np.einsum('ij,ij->i', v2, v0)
+        d21 = np.einsum('ij,ij->i', v2, v1)
+        denom = d00 * d11 - d01 * d01
+        denom = np.where(np.abs(denom) > 0.0, denom, 1.0)
+        bv = (d11 * d20 - d01 * d21) / denom
+        bw = (d00 * d21 - d01 * d20) / denom
+        bary = np.stack((1.0 - bv - bw, bv, bw), axis=1)
+
+        zero = bary < _FEATURE_TOLERANCE
+        n_zero = zero.sum(axis=1)
+        out = self.face_normals[cell_ids].copy()
+        # One zero coordinate: on the edge opposite that corner (edges are ab, bc, ca)
+        on_edge = n_zero == 1
+        if on_edge.any():
+            opposite = np.argmax(zero[on_edge], axis=1)
+            edge_slot = (opposite + 1) % 3
+            out[on_edge] = self.edge_normals[self.edge_ids[cell_ids[on_edge], edge_slot]]
+        # Two or more: at the corner with the largest coordinate
+        on_vertex = n_zero >= 2
+        if on_vertex.any():
+            corner = np.argmax(bary[on_vertex], axis=1)
+            out[on_vertex] = self.vertex_normals[f[on_vertex, corner]]
+        return out
+
+    def signs(self, points, closest, cell_ids):
+        """+1 outside, -1 inside for each point given its closest surface point and cell id."""
+        import numpy as np
+
+        normals = self.normals_at(closest, cell_ids)
+        return np.where(np.einsum('ij,ij->i', points - closest, normals) < 0.0, -1.0, 1.0)
+
+
+def enclosed(points, surface):
+    """Boolean mask of the points inside a closed surface (ray casting, any orientation)."""
+    import numpy as np
+    import vtk
+    from vtk.util.numpy_support import numpy_to_vtk, vtk_to_numpy
+
+    points = np.asarray(points, dtype=np.float64)
+    if not len(points):
+        return np.zeros(0, dtype=bool)
+    vtk_points = vtk.vtkPoints()
+    vtk_points.SetData(numpy_to_vtk(np.ascontiguousarray(points), deep=1))
+    query = vtk.vtkPolyData()
+    query.SetPoints(vtk_points)
+    select = vtk.vtkSelectEnclosedPoints()
+    select.SetInputData(query)
+    select.SetSurfaceData(distance.triangulate(surface))
+    select.CheckSurfaceOff()
+    select.Update()
+    return vtk_to_numpy(select.GetOutput().GetPointData().GetArray('SelectedPoints')).astype(bool)
+
+
+def signed_closest_distances(points, locator, normals, max_distance=None, num_workers=1, progress=None,
+                             surface=None):
+    """
+    Signed distance from each point to the surface held by locator (negative inside),
+    from the same closest-point queries as the unsigned distance. With max_distance,
+    points farther than the cutoff get +max_distance, or -max_distance if they lie inside
+    (tested only for those points, and only on a closed surface).
+    normals: PseudoNormals of the locator's surface.
+    surface: closed surface for that inside test when the locator holds a crop of it
+    (default: the locator's own surface)
+    """
+    import numpy as np
+
+    points = np.asarray(points, dtype=np.float64)
+    d, closest, cell_ids = distance.parallel_closest_distances(points, locator, max_distance, num_workers,
+                                                               progress=progress, with_closest=True)
+    found = cell_ids >= 0
+    if found.any():
+        d[found] *= normals.signs(points[found], closest[found], cell_ids[found])
+    if normals.closed and not found.all():
+        negate_enclosed(points, d, np.flatnonzero(~found), locator.GetDataSet() if surface is None else surface)
+    return d
+
+
+def negate_enclosed(points, values, indices, surface):
+    """Negates values[indices] where those points lie inside the closed surface (in place)."""
+    import numpy as np
+
+    bounds = np.asarray(surface.GetBounds()).reshape((3, 2))
+    # Outside the surface's bounds nothing is enclosed
+    candidates = indices[np.all((points[indices] >= bounds[:, 0]) & (points[indices] <= bounds[:, 1]), axis=1)]
+    if len(candidates):
+        values[candidates[enclosed(points[candidates], surface)]] *= -1.0
+
+
+def signed_locator_distance(source_polydata, target_polydata, max_distance=None, num_workers=1, locator=None,
+                            normals=None, progress=None, surface=None):
+    """
+    Signed counterpart of distance.locator_distance: negative values are source points
+    inside the target (penetration). surface: as in signed_closest_distances.
+    Returns the source geometry with a "Distance" point array.
+    """
+    if locator is None:
+        locator = distance.build_target_locator(target_polydata)
+    if normals is None:
+        normals = PseudoNormals.from_locator(locator)
+    if not normals.closed:
+        logging.warning("Signed distance: target surface is not closed; signs near its boundary may be wrong")
+    points = distance.polydata_points(source_polydata)
+    logging.info(f"Signed locator distance: {len(points)} points, cutoff={max_distance}")
+    values = signed_closest_distances(points, locator, normals, max_distance, num_workers, progress, surface)
+    return distance.attach_distances(source_polydata, values)